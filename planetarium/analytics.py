@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast, NullIf, TruncDate
+
+from planetarium.models import DailyOccupancy, ShowSession
+
+GROUPS = {
+    "day": ("day",),
+    "astronomy_show": ("astronomy_show", "astronomy_show__title"),
+    "planetarium_dome": ("planetarium_dome", "planetarium_dome__name"),
+}
+
+
+def rebuild_daily_occupancy(show_sessions=None, rollups=None) -> int:
+    """Recomputes rollup rows from the show session counters.
+
+    ``show_sessions`` and ``rollups`` narrow the rebuild down to matching
+    querysets; both default to everything. Returns the number of rows.
+    """
+    if show_sessions is None:
+        show_sessions = ShowSession.objects.all()
+    if rollups is None:
+        rollups = DailyOccupancy.objects.all()
+
+    rows = (
+        show_sessions.order_by()
+        .annotate(day=TruncDate("show_time"))
+        .values("day", "astronomy_show_id", "planetarium_dome_id")
+        .annotate(
+            sessions=Count("id"),
+            capacity=Sum(
+                F("planetarium_dome__rows") * F("planetarium_dome__seats_in_row")
+            ),
+            sold=Sum("tickets_sold"),
+        )
+    )
+    with transaction.atomic():
+        rollups.delete()
+        created = DailyOccupancy.objects.bulk_create(
+            (
+                DailyOccupancy(
+                    day=row["day"],
+                    astronomy_show_id=row["astronomy_show_id"],
+                    planetarium_dome_id=row["planetarium_dome_id"],
+                    sessions=row["sessions"],
+                    capacity=row["capacity"],
+                    tickets_sold=row["sold"],
+                )
+                for row in rows.iterator()
+            ),
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def occupancy_report(group_by, day_from=None, day_to=None):
+    """Sold seats and fill rate of the rollups grouped by the given keys"""
+    rollups = DailyOccupancy.objects.all()
+    if day_from is not None:
+        rollups = rollups.filter(day__gte=day_from)
+    if day_to is not None:
+        rollups = rollups.filter(day__lte=day_to)
+
+    fields = [field for group in group_by for field in GROUPS[group]]
+    return (
+        rollups.values(*fields)
+        .annotate(
+            sessions=Sum("sessions"),
+            capacity=Sum("capacity"),
+            tickets_sold=Sum("tickets_sold"),
+        )
+        .annotate(
+            fill_rate=Cast("tickets_sold", FloatField())
+            / NullIf(Cast("capacity", FloatField()), 0.0)
+        )
+        .order_by(*fields)
+    )
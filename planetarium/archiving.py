@@ -0,0 +1,79 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from planetarium.models import ShowSession, Ticket, TicketArchive
+
+DEFAULT_SETTINGS = {"HORIZON_DAYS": 365, "BATCH_SIZE": 50}
+
+
+def get_settings() -> dict:
+    return {**DEFAULT_SETTINGS, **getattr(settings, "SESSION_ARCHIVE", {})}
+
+
+def archivable_show_sessions(horizon_days: int):
+    """Sessions that ended more than ``horizon_days`` ago and are not archived"""
+    return ShowSession.objects.filter(
+        show_time__lt=timezone.now() - timedelta(days=horizon_days),
+        archived_at__isnull=True,
+    )
+
+
+def archive_show_sessions(show_session_ids) -> tuple:
+    """Moves the tickets of the sessions to TicketArchive in one transaction.
+
+    Tickets are deleted with a plain DELETE: their signals would release the
+    seats, while the seat maps, tickets_sold counters and daily rollups of
+    archived sessions stay as they are. Returns the numbers of archived
+    sessions and tickets.
+    """
+    with transaction.atomic():
+        show_session_ids = list(
+            ShowSession.objects.select_for_update()
+            .filter(id__in=show_session_ids, archived_at__isnull=True)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        if not show_session_ids:
+            return 0, 0
+
+        places = defaultdict(list)
+        for reservation_id, show_session_id, row, seat in (
+            Ticket.objects.filter(show_session__in=show_session_ids)
+            .order_by("reservation_id", "show_session_id", "row", "seat")
+            .values_list("reservation_id", "show_session_id", "row", "seat")
+            .iterator(chunk_size=5000)
+        ):
+            places[reservation_id, show_session_id].append((row, seat))
+        TicketArchive.objects.bulk_create(
+            (
+                TicketArchive(
+                    reservation_id=reservation_id,
+                    show_session_id=show_session_id,
+                    places=TicketArchive.pack_places(reservation_places),
+                )
+                for (
+                    reservation_id,
+                    show_session_id,
+                ), reservation_places in places.items()
+            ),
+            batch_size=1000,
+        )
+
+        quote_name = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {quote_name(Ticket._meta.db_table)} WHERE "
+                f"{quote_name(Ticket._meta.get_field('show_session').column)} "
+                f"IN ({', '.join(['%s'] * len(show_session_ids))})",
+                show_session_ids,
+            )
+            tickets = cursor.rowcount
+
+        ShowSession.objects.filter(id__in=show_session_ids).update(
+            archived_at=timezone.now()
+        )
+    return len(show_session_ids), tickets
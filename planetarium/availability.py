@@ -0,0 +1,73 @@
+from collections import defaultdict
+
+from planetarium.models import Ticket
+from planetarium.seating import SeatMap
+
+MAX_SESSIONS = 500
+MAX_DAYS = 31
+FIELDS = (
+    "id",
+    "show_time",
+    "astronomy_show_id",
+    "planetarium_dome_id",
+    "planetarium_dome__rows",
+    "planetarium_dome__seats_in_row",
+    "tickets_sold",
+)
+
+
+def session_availability(show_sessions, with_seat_maps=False) -> list:
+    """Remaining seats of show sessions read from their counters in one query.
+
+    With ``with_seat_maps`` the packed occupancy of every session is added.
+    Seat maps that do not fit their dome are rebuilt from a single ticket
+    query for all of them.
+    """
+    fields = FIELDS + ("occupancy",) if with_seat_maps else FIELDS
+    rows = list(show_sessions.order_by("show_time", "id").values(*fields))
+
+    seat_maps = {}
+    if with_seat_maps:
+        stale = []
+        for row in rows:
+            try:
+                seat_maps[row["id"]] = SeatMap(
+                    row["planetarium_dome__rows"],
+                    row["planetarium_dome__seats_in_row"],
+                    row["occupancy"],
+                )
+            except ValueError:
+                stale.append(row)
+        if stale:
+            places = defaultdict(list)
+            for show_session_id, ticket_row, seat in Ticket.objects.filter(
+                show_session__in=[row["id"] for row in stale]
+            ).values_list("show_session_id", "row", "seat"):
+                places[show_session_id].append((ticket_row, seat))
+            for row in stale:
+                seat_maps[row["id"]] = SeatMap.from_places(
+                    row["planetarium_dome__rows"],
+                    row["planetarium_dome__seats_in_row"],
+                    (
+                        place
+                        for place in places[row["id"]]
+                        if place[0] <= row["planetarium_dome__rows"]
+                        and place[1] <= row["planetarium_dome__seats_in_row"]
+                    ),
+                )
+
+    availability = []
+    for row in rows:
+        capacity = row["planetarium_dome__rows"] * row["planetarium_dome__seats_in_row"]
+        item = {
+            "id": row["id"],
+            "show_time": row["show_time"],
+            "astronomy_show": row["astronomy_show_id"],
+            "planetarium_dome": row["planetarium_dome_id"],
+            "capacity": capacity,
+            "tickets_available": capacity - row["tickets_sold"],
+        }
+        if with_seat_maps:
+            item["seat_map"] = seat_maps[row["id"]].to_base64()
+        availability.append(item)
+    return availability
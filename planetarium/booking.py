@@ -0,0 +1,164 @@
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from planetarium.models import Reservation, SeatHold, ShowSession, Ticket
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 0.05
+# Postgres serialization_failure and deadlock_detected
+RETRYABLE_PGCODES = ("40001", "40P01")
+DEFAULT_SETTINGS = {"HOLD_TTL": 300}
+
+
+def get_settings() -> dict:
+    return {**DEFAULT_SETTINGS, **getattr(settings, "SEAT_HOLDS", {})}
+
+
+class SeatsTaken(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Some of the requested seats are already taken."
+    default_code = "seats_taken"
+
+    def __init__(self, places):
+        super().__init__()
+        self.places = sorted(places)
+        # Seat coordinates are kept as numbers rather than error strings
+        self.detail = {
+            "detail": self.detail,
+            "seats": [
+                {"show_session": show_session_id, "row": row, "seat": seat}
+                for show_session_id, row, seat in self.places
+            ],
+        }
+
+
+def is_retryable(error: OperationalError) -> bool:
+    return getattr(error.__cause__, "pgcode", None) in RETRYABLE_PGCODES
+
+
+def book_tickets(tickets_data, **reservation_data) -> Reservation:
+    """Creates a reservation with its tickets, one booking per session at a time.
+
+    The show sessions are locked in id order before their seat maps are
+    checked, so competing bookings of the same session queue up instead of
+    failing on the ticket unique constraint. Seats sold in the meantime are
+    reported with SeatsTaken, like seats another user holds; serialization
+    failures and deadlocks are retried. The booking user's own holds on the
+    sessions are released.
+    """
+    places = [
+        (ticket_data["show_session"].id, ticket_data["row"], ticket_data["seat"])
+        for ticket_data in tickets_data
+    ]
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                conflicts = ShowSession.update_seat_maps(places, taken=True)
+                if conflicts:
+                    raise SeatsTaken(conflicts)
+                user = reservation_data["user"]
+                held = find_held_places(places, user)
+                if held:
+                    raise SeatsTaken(held)
+                SeatHold.objects.filter(
+                    user=user,
+                    show_session__in={
+                        show_session_id for show_session_id, _, _ in places
+                    },
+                ).delete()
+
+                reservation = Reservation.objects.create(**reservation_data)
+                Ticket.objects.bulk_create(
+                    Ticket(reservation=reservation, **ticket_data)
+                    for ticket_data in tickets_data
+                )
+                return reservation
+        except OperationalError as error:
+            if attempt == MAX_ATTEMPTS or not is_retryable(error):
+                raise
+            time.sleep(RETRY_DELAY * attempt * random.uniform(1, 2))
+        except IntegrityError:
+            # The seat map drifted from the tickets: report what is sold
+            sold = set(places) & set(find_sold_places(places))
+            if not sold:
+                raise
+            raise SeatsTaken(sold)
+
+
+def find_sold_places(places):
+    return Ticket.objects.filter(
+        show_session__in={show_session_id for show_session_id, _, _ in places},
+        row__in={row for _, row, _ in places},
+        seat__in={seat for _, _, seat in places},
+    ).values_list("show_session_id", "row", "seat")
+
+
+def find_held_places(places, user) -> set:
+    """Places of ``places`` held by anybody but ``user``"""
+    return set(places) & set(
+        SeatHold.objects.filter(
+            show_session__in={show_session_id for show_session_id, _, _ in places},
+            row__in={row for _, row, _ in places},
+            seat__in={seat for _, _, seat in places},
+            expires_at__gt=timezone.now(),
+        )
+        .exclude(user=user)
+        .values_list("show_session_id", "row", "seat")
+    )
+
+
+def find_best_seats(show_session, count: int) -> list:
+    """(row, seat) of the best free block of ``count`` seats, empty if none.
+
+    Seats held by anyone count as taken.
+    """
+    seat_map = show_session.get_seat_map()
+    for row, seat in show_session.seat_holds.filter(
+        expires_at__gt=timezone.now()
+    ).values_list("row", "seat"):
+        seat_map.take(row, seat)
+
+    block = seat_map.find_block(count)
+    if block is None:
+        return []
+    row, first_seat = block
+    return [(row, seat) for seat in range(first_seat, first_seat + count)]
+
+
+def hold_best_seats(show_session_id: int, count: int, user) -> tuple:
+    """Finds and holds the best block for ``user``, returns (places, expiry).
+
+    The session is locked like for a booking, so two holds never overlap.
+    Expired holds and earlier holds of the user on the session are dropped.
+    """
+    with transaction.atomic():
+        show_session = (
+            ShowSession.objects.select_for_update(of=("self",))
+            .select_related("planetarium_dome")
+            .get(pk=show_session_id)
+        )
+        now = timezone.now()
+        show_session.seat_holds.filter(Q(expires_at__lte=now) | Q(user=user)).delete()
+
+        places = find_best_seats(show_session, count)
+        expires_at = now + timedelta(seconds=get_settings()["HOLD_TTL"])
+        SeatHold.objects.bulk_create(
+            SeatHold(
+                show_session=show_session,
+                row=row,
+                seat=seat,
+                user=user,
+                expires_at=expires_at,
+            )
+            for row, seat in places
+        )
+    return places, expires_at if places else None
@@ -0,0 +1,144 @@
+import hashlib
+import threading
+import uuid
+from functools import partial
+
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from planetarium.routers import pin_to_primary
+
+CATALOG_CACHE = "catalog"
+STATS_KEYS = {"hits": "stats:hits", "misses": "stats:misses"}
+# Lookups counted in process before they are added to the shared counters
+STATS_FLUSH_EVERY = 100
+
+_pending_stats = dict.fromkeys(STATS_KEYS, 0)
+_stats_lock = threading.Lock()
+
+
+def catalog_cache():
+    return caches[CATALOG_CACHE]
+
+
+def version_key(model) -> str:
+    return f"version:{model._meta.label_lower}"
+
+
+def get_versions(models) -> list:
+    """Current version tokens of the models, created on first use"""
+    cache = catalog_cache()
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(model):
+    """Invalidates every cached response built from the model.
+
+    Inside a transaction the version changes again once it commits, as
+    concurrent readers still see the old rows until then and may cache
+    them under the first new version. Reads go to the primary for a while,
+    so the new entries are not built from a replica that has not caught up
+    with the change yet.
+    """
+    set_new_version(model)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(set_new_version, model))
+
+
+def set_new_version(model):
+    catalog_cache().set(version_key(model), uuid.uuid4().hex, timeout=None)
+    pin_to_primary()
+
+
+def record_lookup(hit: bool):
+    """Counts the lookup, every STATS_FLUSH_EVERY in the shared counters"""
+    with _stats_lock:
+        _pending_stats["hits" if hit else "misses"] += 1
+        if sum(_pending_stats.values()) < STATS_FLUSH_EVERY:
+            return
+        pending = dict(_pending_stats)
+        _pending_stats.update(dict.fromkeys(STATS_KEYS, 0))
+    flush_stats(pending)
+
+
+def flush_stats(pending: dict):
+    cache = catalog_cache()
+    for name, count in pending.items():
+        if not count:
+            continue
+        key = STATS_KEYS[name]
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            cache.set(key, count, timeout=None)
+
+
+def get_stats() -> dict:
+    """Shared counters plus the lookups this process has not added yet"""
+    cache = catalog_cache()
+    values = cache.get_many(STATS_KEYS.values())
+    with _stats_lock:
+        stats = {
+            name: values.get(key, 0) + _pending_stats[name]
+            for name, key in STATS_KEYS.items()
+        }
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        _pending_stats.update(dict.fromkeys(STATS_KEYS, 0))
+    catalog_cache().delete_many(STATS_KEYS.values())
+
+
+class CachedResponseMixin:
+    """Caches serialized list responses of read-mostly viewsets.
+
+    Entries are keyed by the absolute URL with sorted query params and by the
+    version tokens of ``cache_models``, so bumping a model version makes every
+    response built from it unreachable. Other read actions can be cached by
+    passing their handler to ``get_cached_response``.
+    """
+
+    cache_models = ()
+
+    def get_cache_key(self, request) -> str:
+        query = sorted(request.query_params.lists())
+        parts = [
+            request.build_absolute_uri(request.path),
+            repr(query),
+            *get_versions(self.cache_models),
+        ]
+        digest = hashlib.sha256("|".join(parts).encode()).hexdigest()
+        return f"response:{digest}"
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        cache = catalog_cache()
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            record_lookup(hit=True)
+            response = Response(data, status=status.HTTP_200_OK)
+            response["X-Cache"] = "HIT"
+            return response
+
+        record_lookup(hit=False)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data)
+        response["X-Cache"] = "MISS"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
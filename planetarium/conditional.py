@@ -0,0 +1,74 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+
+
+class ConditionalGetMixin:
+    """Adds ETag/Last-Modified validators to read actions of a viewset.
+
+    Validators come from one aggregate over the filtered queryset: the row
+    count and the latest of the ``conditional_timestamps`` lookups. Matching
+    If-None-Match/If-Modified-Since requests get a 304 before the queryset is
+    evaluated or serialized.
+    """
+
+    conditional_timestamps = ("updated_at",)
+
+    def get_validator_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            queryset = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        return queryset
+
+    def get_validators(self, request) -> tuple:
+        aggregates = self.get_validator_queryset().aggregate(
+            count=Count("pk"),
+            **{
+                f"timestamp_{index}": Max(lookup)
+                for index, lookup in enumerate(self.conditional_timestamps)
+            },
+        )
+        timestamps = [
+            aggregates[f"timestamp_{index}"]
+            for index in range(len(self.conditional_timestamps))
+        ]
+        last_modified = max(filter(None, timestamps), default=None)
+
+        parts = [
+            request.path,
+            repr(sorted(request.query_params.lists())),
+            getattr(request.accepted_renderer, "format", ""),
+            str(aggregates["count"]),
+            *(timestamp.isoformat() if timestamp else "" for timestamp in timestamps),
+        ]
+        etag = '"%s"' % hashlib.sha256("|".join(parts).encode()).hexdigest()
+        return etag, last_modified and int(last_modified.timestamp())
+
+    @staticmethod
+    def set_validator_headers(response, etag, last_modified):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def get_conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            return self.set_validator_headers(not_modified, etag, last_modified)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            self.set_validator_headers(response, etag, last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(super().list, request, *args, **kwargs)
@@ -0,0 +1,30 @@
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+
+def parse_day(value: str, param_name: str) -> date:
+    """Converts a YYYY-MM-DD query param to a date"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValidationError({param_name: "Date has wrong format. Use YYYY-MM-DD."})
+
+
+def start_of_day(day: date) -> datetime:
+    """Aware datetime of the midnight that starts the given day"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def show_time_range(params) -> tuple:
+    """Half-open (start, end) show_time bounds of the from/to days of params.
+
+    Both days are included, a bound that is not given is None.
+    """
+    start = end = None
+    if params.get("from"):
+        start = start_of_day(parse_day(params["from"], "from"))
+    if params.get("to"):
+        end = start_of_day(parse_day(params["to"], "to") + timedelta(days=1))
+    return start, end
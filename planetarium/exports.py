@@ -0,0 +1,117 @@
+import csv
+import heapq
+import json
+from operator import itemgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from planetarium.models import Ticket, TicketArchive
+
+CHUNK_SIZE = 2000
+EXPORT_COLUMNS = (
+    ("ticket_id", "id"),
+    ("row", "row"),
+    ("seat", "seat"),
+    ("reservation_id", "reservation_id"),
+    ("reserved_at", "reservation__created_at"),
+    ("user_email", "reservation__user__email"),
+    ("show_session_id", "show_session_id"),
+    ("show_time", "show_session__show_time"),
+    ("astronomy_show", "show_session__astronomy_show__title"),
+    ("planetarium_dome", "show_session__planetarium_dome__name"),
+)
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def ticket_rows(show_time_from=None, show_time_to=None, chunk_size=CHUNK_SIZE):
+    """Ticket export rows as tuples, fetched chunk by chunk.
+
+    On Postgres iterator() reads through a server-side cursor, so memory use
+    does not grow with the number of tickets. Tickets of archived sessions
+    are merged in by show time, without a ticket id.
+    """
+    lookups = [lookup for _, lookup in EXPORT_COLUMNS]
+    live = (
+        filter_show_time(Ticket.objects.all(), show_time_from, show_time_to)
+        .order_by("show_session__show_time", "show_session_id", "id")
+        .values_list(*lookups)
+        .iterator(chunk_size=chunk_size)
+    )
+    archived = archived_ticket_rows(
+        filter_show_time(TicketArchive.objects.all(), show_time_from, show_time_to),
+        chunk_size,
+    )
+    return heapq.merge(
+        live,
+        archived,
+        key=itemgetter(
+            lookups.index("show_session__show_time"), lookups.index("show_session_id")
+        ),
+    )
+
+
+def filter_show_time(queryset, show_time_from, show_time_to):
+    if show_time_from is not None:
+        queryset = queryset.filter(show_session__show_time__gte=show_time_from)
+    if show_time_to is not None:
+        queryset = queryset.filter(show_session__show_time__lt=show_time_to)
+    return queryset
+
+
+def archived_ticket_rows(queryset, chunk_size=CHUNK_SIZE):
+    """Export rows of the places packed in TicketArchive rows"""
+    lookups = [
+        lookup for _, lookup in EXPORT_COLUMNS if lookup not in ("id", "row", "seat")
+    ]
+    for values in (
+        queryset.order_by("show_session__show_time", "show_session_id", "id")
+        .values_list(*lookups, "places")
+        .iterator(chunk_size=chunk_size)
+    ):
+        columns = dict(zip(lookups, values))
+        for row, seat in TicketArchive.PLACE.iter_unpack(bytes(values[-1])):
+            columns.update(id=None, row=row, seat=seat)
+            yield tuple(columns[lookup] for _, lookup in EXPORT_COLUMNS)
+
+
+class Echo:
+    """File-like object handing back what csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def batched(lines, size=500):
+    """Joins lines so the response is not written row by row"""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    yield from batched(
+        writer.writerow(
+            [
+                value.isoformat() if hasattr(value, "isoformat") else value
+                for value in row
+            ]
+        )
+        for row in rows
+    )
+
+
+def iter_ndjson(rows):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    yield from batched(
+        json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + "\n" for row in rows
+    )
+
+
+WRITERS = {"csv": iter_csv, "ndjson": iter_ndjson}
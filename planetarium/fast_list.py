@@ -0,0 +1,178 @@
+import threading
+from types import SimpleNamespace
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import FileField
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from planetarium.instrumentation import timing
+
+_row_serializers = threading.local()
+
+
+class ValuesRowSerializer:
+    """Serializes values_list() rows with the fields of a serializer.
+
+    Every field of ``serializer`` becomes a column: its dotted source is
+    turned into a lookup (or an expression from ``expressions``, keyed by
+    source) and its own ``to_representation`` formats the value, so the
+    output matches the serializer without building model instances.
+    Many-to-many slug fields are fetched with one extra query per page and
+    ``source="*"`` fields get an object with the row's own columns, plus
+    the ``row_lookups`` the field declares.
+    """
+
+    def __init__(self, serializer, expressions=None):
+        expressions = expressions or {}
+        self.serializer = serializer
+        self.model = serializer.Meta.model
+        self.annotations = {}
+        self.lookups = []
+        self.columns = []
+        self.many = {}
+        self.whole_row = []
+        self.field_names = list(serializer.fields)
+
+        row_lookups = []
+        for name, field in serializer.fields.items():
+            if field.source == "*":
+                self.whole_row.append((name, field.to_representation))
+                row_lookups += getattr(field, "row_lookups", ())
+                continue
+            if isinstance(field, serializers.ManyRelatedField):
+                self.many[name] = field
+                continue
+
+            if field.source in expressions:
+                lookup = f"_values_{name}"
+                self.annotations[lookup] = expressions[field.source]
+            else:
+                lookup = "__".join(field.source_attrs)
+            self.add_column(name, lookup, field)
+
+        for lookup in row_lookups:
+            if lookup not in self.lookups:
+                # Not serialized, only passed to the source="*" fields
+                self.lookups.append(lookup)
+                self.columns.append((None, lookup, None, None))
+
+    def add_column(self, name, lookup, field):
+        convert = None
+        if "__" not in lookup and not lookup.startswith("_values_"):
+            try:
+                model_field = self.model._meta.get_field(lookup)
+            except FieldDoesNotExist:
+                model_field = None
+            if isinstance(model_field, FileField):
+                # FileField.to_representation expects a FieldFile, not a name
+                def convert(value, model_field=model_field):
+                    return model_field.attr_class(None, model_field, value)
+
+        self.lookups.append(lookup)
+        self.columns.append((name, lookup, convert, field.to_representation))
+
+    def get_queryset(self, queryset):
+        return (
+            queryset.prefetch_related(None)
+            .annotate(**self.annotations)
+            .values_list(*self.lookups)
+        )
+
+    def many_values(self, rows) -> dict:
+        """{field name: {pk: [values]}} for the many-to-many fields of the page"""
+        if not self.many:
+            return {}
+        pk_index = self.lookups.index("id")
+        ids = [row[pk_index] for row in rows]
+        values = {}
+        for name, field in self.many.items():
+            relation = field.child_relation
+            if not isinstance(relation, serializers.SlugRelatedField):
+                raise ImproperlyConfigured(
+                    f"{name}: only slug many-to-many fields can be read as values"
+                )
+            model_field = self.model._meta.get_field(field.source)
+            through = model_field.remote_field.through
+            source_column = f"{model_field.m2m_field_name()}_id"
+            target = model_field.m2m_reverse_field_name()
+            values[name] = {pk: [] for pk in ids}
+            for pk, value in (
+                through.objects.filter(**{f"{source_column}__in": ids})
+                .order_by(source_column, f"{target}_id")
+                .values_list(source_column, f"{target}__{relation.slug_field}")
+            ):
+                values[name][pk].append(value)
+        return values
+
+    def to_representation(self, rows) -> list:
+        rows = list(rows)
+        many_values = self.many_values(rows)
+        data = []
+        for row in rows:
+            item, own = {}, {}
+            for (name, lookup, convert, to_representation), value in zip(
+                self.columns, row
+            ):
+                if convert is not None:
+                    value = convert(value)
+                own[lookup] = value
+                if name is not None:
+                    item[name] = None if value is None else to_representation(value)
+            for name, values in many_values.items():
+                item[name] = values[own["id"]]
+            if self.whole_row:
+                obj = SimpleNamespace(**own)
+                for name, to_representation in self.whole_row:
+                    item[name] = to_representation(obj)
+            data.append(item)
+
+        if self.many or self.whole_row:
+            # Keep the field order of the serializer
+            data = [{name: item[name] for name in self.field_names} for item in data]
+        return data
+
+
+class ValuesListMixin:
+    """Serves list actions from values_list() rows instead of model instances.
+
+    The list serializer keeps describing the response in the schema; add
+    expressions for sources that are Python properties to
+    ``values_expressions``.
+    """
+
+    values_expressions = {}
+
+    def get_row_serializer(self) -> ValuesRowSerializer:
+        """The row serializer of the list serializer, built once per thread.
+
+        Requests of one thread run one after another, so each of them hands
+        its own serializer context to the fields of the shared instance.
+        """
+        if not hasattr(_row_serializers, "by_view"):
+            _row_serializers.by_view = {}
+        serializer_class = self.get_serializer_class()
+        key = (type(self), serializer_class)
+        row_serializer = _row_serializers.by_view.get(key)
+        if row_serializer is None:
+            row_serializer = ValuesRowSerializer(
+                serializer_class(), self.values_expressions
+            )
+            _row_serializers.by_view[key] = row_serializer
+        row_serializer.serializer._context = self.get_serializer_context()
+        return row_serializer
+
+    def list(self, request, *args, **kwargs):
+        row_serializer = self.get_row_serializer()
+
+        queryset = row_serializer.get_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = self.paginate_queryset(queryset)
+        with timing("serialize"):
+            data = row_serializer.to_representation(
+                page if page is not None else queryset
+            )
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
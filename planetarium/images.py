@@ -0,0 +1,109 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from planetarium.cache import bump_version
+from planetarium.models import AstronomyShow
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels, images are never upscaled
+VARIANTS = {"thumbnail": 320, "card": 800, "full": 1920}
+FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+QUALITY = 82
+DEFAULT_SETTINGS = {"WORKERS": 2, "ASYNC": True}
+
+_executor = None
+_executor_lock = threading.Lock()
+# Renders of one variant are serialized by one lock of a fixed set
+_variant_locks = [threading.Lock() for _ in range(32)]
+
+
+def get_settings() -> dict:
+    return {**DEFAULT_SETTINGS, **getattr(settings, "IMAGE_VARIANTS", {})}
+
+
+def variant_name(name: str, variant: str, image_format: str) -> str:
+    """Storage name of a variant, derived from the original image name"""
+    directory, filename = os.path.split(name)
+    stem, _ = os.path.splitext(filename)
+    return os.path.join(directory, "variants", f"{stem}-{variant}.{image_format}")
+
+
+def render_variant(image, variant: str, image_format: str) -> bytes:
+    resized = image.copy()
+    resized.thumbnail((VARIANTS[variant],) * 2, Image.Resampling.LANCZOS)
+    output = BytesIO()
+    resized.save(output, FORMATS[image_format], quality=QUALITY, optimize=True)
+    return output.getvalue()
+
+
+def open_original(name: str):
+    with default_storage.open(name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        # RGB without EXIF, ICC or other metadata of the upload
+        image = image.convert("RGB")
+    image.info = {}
+    return image
+
+
+def generate_variant(name: str, variant: str, image_format: str, image=None) -> str:
+    """Renders one variant unless it is stored already, returns its name"""
+    target = variant_name(name, variant, image_format)
+    with _variant_locks[hash(target) % len(_variant_locks)]:
+        if not default_storage.exists(target):
+            if image is None:
+                image = open_original(name)
+            default_storage.save(
+                target, ContentFile(render_variant(image, variant, image_format))
+            )
+    return target
+
+
+def generate_variants(name: str):
+    """Renders every missing variant of an original image.
+
+    Once they are stored, the shows using the image link to them directly:
+    their rows are touched and cached catalog responses invalidated.
+    """
+    try:
+        image = open_original(name)
+        for variant in VARIANTS:
+            for image_format in FORMATS:
+                generate_variant(name, variant, image_format, image)
+    except Exception:
+        logger.exception("Could not generate variants of %s", name)
+        return
+
+    AstronomyShow.objects.filter(image=name).update(
+        images_ready=True, updated_at=timezone.now()
+    )
+    bump_version(AstronomyShow)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_settings()["WORKERS"],
+                thread_name_prefix="image-variants",
+            )
+    return _executor
+
+
+def schedule_variants(name: str):
+    """Renders the variants in the worker pool once the upload is committed"""
+    if get_settings()["ASYNC"]:
+        transaction.on_commit(lambda: get_executor().submit(generate_variants, name))
+    else:
+        transaction.on_commit(lambda: generate_variants(name))
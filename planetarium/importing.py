@@ -0,0 +1,194 @@
+import csv
+import json
+import re
+from contextlib import contextmanager
+
+from django.db import models
+from django.utils import timezone
+
+READ_SIZE = 1 << 16
+SEPARATORS = re.compile(r"[\s,]*")
+# Many-to-many ids in a CSV cell: "1|2|3"
+CSV_LIST_SEPARATOR = "|"
+
+
+def iter_json_array(stream):
+    """Yields the objects of a JSON array without loading the whole array"""
+    decoder = json.JSONDecoder()
+    buffer = stream.read(READ_SIZE).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("Expected a JSON array of fixture objects")
+
+    position, finished = 1, False
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            obj, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if finished:
+                raise
+            more = stream.read(READ_SIZE)
+            finished = not more
+            buffer, position = buffer[position:] + more, 0
+            continue
+        yield obj
+
+
+def iter_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_csv(stream, model_label):
+    """Yields fixture-shaped records of one model from a CSV with a header"""
+    for row in csv.DictReader(stream):
+        pk = row.pop("pk", None) or row.pop("id", None)
+        yield {
+            "model": model_label,
+            "pk": pk,
+            "fields": {
+                name.removesuffix("_id"): None if value == "" else value
+                for name, value in row.items()
+            },
+        }
+
+
+READERS = {"json": iter_json_array, "ndjson": iter_ndjson, "csv": iter_csv}
+
+
+def dependency_levels(import_models) -> dict:
+    """Models ordered into levels that only reference lower levels"""
+    levels = {}
+
+    def level(model, path=()):
+        if model in levels:
+            return levels[model]
+        if model in path:
+            raise ValueError(f"Circular reference through {model._meta.label}")
+        dependencies = [
+            field.related_model
+            for field in model._meta.get_fields()
+            if (field.many_to_one or field.one_to_one or field.many_to_many)
+            and field.concrete
+            and field.related_model in import_models
+            and field.related_model is not model
+        ]
+        levels[model] = 1 + max(
+            (level(dependency, path + (model,)) for dependency in dependencies),
+            default=-1,
+        )
+        return levels[model]
+
+    for model in import_models:
+        level(model)
+    return levels
+
+
+class RecordBuilder:
+    """Turns fixture records of one model into unsaved instances"""
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = {}
+        self.many_to_many = {}
+        for field in model._meta.get_fields():
+            if field.many_to_many and field.concrete:
+                self.many_to_many[field.name] = field
+            elif field.concrete:
+                self.fields[field.name] = field
+        self.timestamps = [
+            field
+            for field in self.fields.values()
+            if getattr(field, "auto_now", False)
+            or getattr(field, "auto_now_add", False)
+        ]
+
+    def build(self, record) -> tuple:
+        """The instance and its many-to-many ids, ValueError when invalid"""
+        obj = self.model(pk=self.model._meta.pk.to_python(record.get("pk")))
+        relations = {}
+        for name, value in record["fields"].items():
+            if name in self.many_to_many:
+                if isinstance(value, str):
+                    value = value.split(CSV_LIST_SEPARATOR) if value else []
+                relations[name] = value or []
+                continue
+
+            field = self.fields.get(name)
+            if field is None:
+                raise ValueError(f"Unknown field {name}")
+            if field.is_relation:
+                value = field.target_field.to_python(value)
+            else:
+                value = field.to_python(value)
+            setattr(obj, field.attname, value)
+
+        now = timezone.now()
+        for field in self.timestamps:
+            if getattr(obj, field.attname) is None:
+                setattr(obj, field.attname, now)
+        return obj, relations
+
+    def through_rows(self, obj, relations) -> dict:
+        rows = {}
+        for name, ids in relations.items():
+            field = self.many_to_many[name]
+            through = field.remote_field.through
+            rows.setdefault(through, []).extend(
+                through(
+                    **{
+                        f"{field.m2m_field_name()}_id": obj.pk,
+                        f"{field.m2m_reverse_field_name()}_id": (
+                            field.target_field.to_python(related_id)
+                        ),
+                    }
+                )
+                for related_id in ids
+            )
+        return rows
+
+
+@contextmanager
+def raw_timestamps(model):
+    """Keeps the given auto_now/auto_now_add values instead of the current time"""
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.DateField)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def copy_field_value(field, obj, connection) -> str:
+    """The value of the field of obj in the Postgres COPY text format"""
+    value = getattr(obj, field.attname)
+    # BinaryField prepares a driver wrapper (psycopg2.Binary), not bytes
+    if not isinstance(field, models.BinaryField):
+        value = field.get_db_prep_save(value, connection)
+    return copy_value(value)
+
+
+def copy_value(value) -> str:
+    """A value in the Postgres COPY text format"""
+    if value is None:
+        return r"\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (bytes, memoryview)):
+        return "\\\\x" + bytes(value).hex()
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
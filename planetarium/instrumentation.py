@@ -0,0 +1,172 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger("planetarium.requests")
+
+DEFAULT_SETTINGS = {
+    "ENABLED": False,
+    "SAMPLE_RATE": 1.0,
+    # A query fingerprint seen this many times in one request is reported
+    "DUPLICATE_THRESHOLD": 3,
+}
+
+# Literal lists of any length share one fingerprint: IN (%s, %s) == IN (%s)
+PLACEHOLDER_LIST = re.compile(r"\((?:\s*%s\s*,)*\s*%s\s*\)")
+NUMBER = re.compile(r"\b\d+\b")
+
+_current_metrics = ContextVar("request_metrics", default=None)
+
+
+def get_settings() -> dict:
+    return {**DEFAULT_SETTINGS, **getattr(settings, "REQUEST_TIMING", {})}
+
+
+def fingerprint(sql: str) -> str:
+    return NUMBER.sub("N", PLACEHOLDER_LIST.sub("(...)", sql))
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.durations = Counter()
+        self.queries = Counter()
+        self.sql_time = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold: int) -> dict:
+        return {sql: count for sql, count in self.queries.items() if count >= threshold}
+
+
+@contextmanager
+def timing(name: str):
+    """Adds the time spent in the block to the metric of the sampled request"""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.durations[name] += time.perf_counter() - started
+
+
+class RequestTimingMiddleware:
+    """Reports SQL, view, auth, throttle and serializer time of sampled requests.
+
+    Timings are sent as a Server-Timing header and logged as one JSON line
+    on the ``planetarium.requests`` logger. Enable it with
+    ``REQUEST_TIMING["ENABLED"]``; ``SAMPLE_RATE`` is the share of
+    requests that are measured.
+    """
+
+    def __init__(self, get_response):
+        options = get_settings()
+        if not options["ENABLED"]:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.sample_rate = options["SAMPLE_RATE"]
+        self.duplicate_threshold = options["DUPLICATE_THRESHOLD"]
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        total = time.perf_counter() - started
+
+        duplicates = metrics.duplicates(self.duplicate_threshold)
+        response["Server-Timing"] = self.server_timing(metrics, total, duplicates)
+        logger.info(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "total_ms": round(total * 1000, 2),
+                    "sql_ms": round(metrics.sql_time * 1000, 2),
+                    "queries": sum(metrics.queries.values()),
+                    **{
+                        f"{name}_ms": round(duration * 1000, 2)
+                        for name, duration in sorted(metrics.durations.items())
+                    },
+                    "duplicate_queries": duplicates,
+                }
+            )
+        )
+        return response
+
+    @staticmethod
+    def server_timing(metrics, total, duplicates) -> str:
+        entries = [
+            f"total;dur={total * 1000:.2f}",
+            f'db;dur={metrics.sql_time * 1000:.2f};desc="'
+            f'{sum(metrics.queries.values())} queries"',
+        ]
+        entries += [
+            f"{name};dur={duration * 1000:.2f}"
+            for name, duration in sorted(metrics.durations.items())
+        ]
+        if duplicates:
+            entries.append(
+                f'dup;desc="{len(duplicates)} repeated, '
+                f'{sum(duplicates.values())} queries"'
+            )
+        return ", ".join(entries)
+
+
+class TimedViewMixin:
+    """Splits a sampled request into view, auth, throttle and serializer time"""
+
+    def dispatch(self, request, *args, **kwargs):
+        with timing("view"):
+            return super().dispatch(request, *args, **kwargs)
+
+    def perform_authentication(self, request):
+        with timing("auth"):
+            super().perform_authentication(request)
+
+    def check_throttles(self, request):
+        with timing("throttle"):
+            super().check_throttles(request)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if _current_metrics.get() is not None:
+            to_representation = serializer.to_representation
+
+            def timed_to_representation(instance):
+                with timing("serialize"):
+                    return to_representation(instance)
+
+            serializer.to_representation = timed_to_representation
+        return serializer
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+
+from planetarium.archiving import (
+    archivable_show_sessions,
+    archive_show_sessions,
+    get_settings,
+)
+
+
+class Command(BaseCommand):
+    """Django command to move tickets of past show sessions to the archive"""
+
+    help = (
+        "Packs the tickets of show sessions older than the horizon into "
+        "TicketArchive rows and removes them from the ticket table. Every "
+        "batch commits on its own, an interrupted run resumes where it "
+        "stopped. Seat maps, counters, rollups and reservations are kept."
+    )
+
+    def add_arguments(self, parser):
+        options = get_settings()
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=options["HORIZON_DAYS"],
+            help="Archive sessions that started more than this many days ago.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=options["BATCH_SIZE"],
+            help="Number of show sessions archived per transaction.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many sessions would be archived.",
+        )
+
+    def handle(self, *args, **options):
+        show_sessions = archivable_show_sessions(options["days"]).order_by("id")
+        if options["dry_run"]:
+            self.stdout.write(f"{show_sessions.count()} show sessions to archive")
+            return
+
+        archived_sessions = archived_tickets = 0
+        while True:
+            show_session_ids = list(
+                show_sessions.values_list("id", flat=True)[: options["batch_size"]]
+            )
+            if not show_session_ids:
+                break
+            sessions, tickets = archive_show_sessions(show_session_ids)
+            archived_sessions += sessions
+            archived_tickets += tickets
+            self.stdout.write(
+                f"{archived_sessions} sessions, {archived_tickets} tickets archived",
+                ending="\r",
+            )
+
+        self.stdout.write("")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {archived_tickets} tickets of "
+                f"{archived_sessions} show sessions"
+            )
+        )
@@ -0,0 +1,230 @@
+import json
+import statistics
+import subprocess
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from planetarium.models import ShowSession
+from planetarium.urls import router
+
+# Query parameters required by extra actions, formatted with the first object
+ACTION_PARAMS = {
+    "availability": "?date={obj.show_time:%Y-%m-%d}",
+    "best_seats": "?count=2",
+}
+
+
+class Command(BaseCommand):
+    """Django command to measure latency and query counts of API endpoints"""
+
+    help = (
+        "Requests the GET endpoints of the planetarium and user APIs (router "
+        "lists, details and extra actions, the ticket export of one day, "
+        "occupancy analytics and the OpenAPI schema) and writes p50/p95/p99 "
+        "latency, queries per request and throughput to a JSON file. Poster "
+        "variant renders are left out."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument(
+            "--user",
+            help="Email of the user to authenticate as (default: first admin).",
+        )
+        parser.add_argument(
+            "--output",
+            help="Result file (default: benchmarks/<timestamp>.json).",
+        )
+        parser.add_argument(
+            "--throttle",
+            action="store_true",
+            help="Keep API throttling enabled while benchmarking.",
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options["user"])
+        client = APIClient(HTTP_HOST="localhost")
+        client.force_authenticate(user)
+
+        endpoints = self.get_endpoints()
+        if not endpoints:
+            raise CommandError("No endpoints to benchmark, is the database empty?")
+
+        throttling = (
+            nullcontext()
+            if options["throttle"]
+            else mock.patch.object(APIView, "get_throttles", return_value=[])
+        )
+        results = []
+        with throttling:
+            for name, url in endpoints:
+                result = self.benchmark(
+                    client, url, options["iterations"], options["warmup"]
+                )
+                result["name"] = name
+                results.append(result)
+                self.stdout.write(
+                    f"{name:<40} {result['status']} "
+                    f"p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms "
+                    f"p99={result['p99_ms']:.2f}ms "
+                    f"queries={result['queries_per_request']:.1f} "
+                    f"{result['throughput_rps']:.1f} req/s"
+                )
+                if result["failures"]:
+                    self.stderr.write(
+                        f"{name}: {result['failures']} of {options['iterations']} "
+                        f"responses were not 2xx, its timings are not comparable"
+                    )
+
+        output = Path(
+            options["output"]
+            or Path("benchmarks") / f"{timezone.now():%Y%m%dT%H%M%S}.json"
+        )
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(
+            json.dumps(
+                {
+                    "commit": self.get_commit(),
+                    "created_at": timezone.now().isoformat(),
+                    "database": connection.vendor,
+                    "iterations": options["iterations"],
+                    "endpoints": results,
+                },
+                indent=2,
+            )
+        )
+        failed = [result["name"] for result in results if result["failures"]]
+        if failed:
+            raise CommandError(
+                f"Results written to {output}, but these endpoints failed: "
+                + ", ".join(failed)
+            )
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+    @staticmethod
+    def get_user(email):
+        users = get_user_model().objects.all()
+        user = (
+            users.filter(email=email).first()
+            if email
+            else users.filter(is_staff=True).first()
+        )
+        if user is None:
+            raise CommandError("Benchmark user not found, pass --user")
+        return user
+
+    @staticmethod
+    def get_endpoints() -> list:
+        """(name, url) of the GET routes, object routes use the first object"""
+        endpoints, seen = [], set()
+        for _, viewset, basename in router.registry:
+            if basename in seen:
+                continue
+            seen.add(basename)
+            if hasattr(viewset, "list"):
+                endpoints.append(
+                    (f"{basename}-list", reverse(f"planetarium:{basename}-list"))
+                )
+
+            get_actions = [
+                extra_action
+                for extra_action in viewset.get_extra_actions()
+                if "get" in extra_action.mapping
+            ]
+            if not hasattr(viewset, "retrieve") and not get_actions:
+                continue
+            obj = viewset.queryset.model.objects.order_by("pk").first()
+            if obj is None:
+                continue
+            if hasattr(viewset, "retrieve"):
+                endpoints.append(
+                    (
+                        f"{basename}-detail",
+                        reverse(f"planetarium:{basename}-detail", args=[obj.pk]),
+                    )
+                )
+            for extra_action in get_actions:
+                url_name = f"{basename}-{extra_action.url_name}"
+                endpoints.append(
+                    (
+                        url_name,
+                        reverse(
+                            f"planetarium:{url_name}",
+                            args=[obj.pk] if extra_action.detail else [],
+                        )
+                        + ACTION_PARAMS.get(extra_action.__name__, "").format(obj=obj),
+                    )
+                )
+
+        show_session = ShowSession.objects.order_by("pk").first()
+        if show_session is not None:
+            day = f"{timezone.localtime(show_session.show_time):%Y-%m-%d}"
+            endpoints.append(
+                (
+                    "ticket-export",
+                    reverse("planetarium:ticket-export") + f"?from={day}&to={day}",
+                )
+            )
+        endpoints.append(
+            ("occupancy-analytics", reverse("planetarium:occupancy-analytics"))
+        )
+        endpoints.append(("schema", reverse("schema")))
+        endpoints.append(("user-manage", reverse("user:manage")))
+        return endpoints
+
+    @staticmethod
+    def benchmark(client, url, iterations, warmup) -> dict:
+        for _ in range(warmup):
+            client.get(url)
+
+        latencies, queries, failures = [], [], 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                request_started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                latencies.append((time.perf_counter() - request_started) * 1000)
+            queries.append(len(captured))
+            if not 200 <= response.status_code < 300:
+                failures += 1
+        elapsed = time.perf_counter() - started
+
+        percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        return {
+            "url": url,
+            "status": response.status_code,
+            "failures": failures,
+            "p50_ms": statistics.median(latencies),
+            "p95_ms": percentiles[94],
+            "p99_ms": percentiles[98],
+            "queries_per_request": statistics.mean(queries),
+            "throughput_rps": iterations / elapsed,
+        }
+
+    @staticmethod
+    def get_commit():
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
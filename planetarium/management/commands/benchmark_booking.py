@@ -0,0 +1,161 @@
+import json
+import random
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from planetarium.booking import SeatsTaken, book_tickets
+from planetarium.management.commands.benchmark_api import Command as ApiBenchmark
+from planetarium.models import (
+    AstronomyShow,
+    PlanetariumDome,
+    Reservation,
+    ShowSession,
+)
+
+
+class Command(BaseCommand):
+    """Django command to measure booking throughput under contention"""
+
+    help = (
+        "Books random blocks of seats of one new show session from "
+        "concurrent buyers until --bookings succeed, retrying taken seats "
+        "like clients do, and writes successful bookings per second, "
+        "conflicts and errors to a JSON file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=16)
+        parser.add_argument(
+            "--bookings",
+            type=int,
+            default=200,
+            help="Successful bookings to make (at most half the dome is sold).",
+        )
+        parser.add_argument(
+            "--seats", type=int, default=2, help="Adjacent seats per booking."
+        )
+        parser.add_argument(
+            "--output",
+            help="Result file (default: benchmarks/booking-<timestamp>.json).",
+        )
+
+    def handle(self, *args, **options):
+        users = list(
+            get_user_model().objects.filter(is_staff=False)[: options["buyers"]]
+        )
+        dome = PlanetariumDome.objects.order_by(-F("rows") * F("seats_in_row")).first()
+        astronomy_show = AstronomyShow.objects.first()
+        if not users or dome is None or astronomy_show is None:
+            raise CommandError("Needs users, a dome and a show, run generate_data")
+        if not 1 <= options["seats"] <= dome.seats_in_row:
+            raise CommandError(f"--seats must be 1 to {dome.seats_in_row}")
+        target = min(options["bookings"], dome.capacity // options["seats"] // 2)
+
+        show_session = ShowSession.objects.create(
+            show_time=timezone.now() + timedelta(days=365),
+            astronomy_show=astronomy_show,
+            planetarium_dome=dome,
+        )
+        try:
+            result = self.run_buyers(show_session, users, options, target)
+        finally:
+            reservations = list(
+                Reservation.objects.filter(tickets__show_session=show_session)
+                .values_list("id", flat=True)
+                .distinct()
+            )
+            show_session.delete()
+            Reservation.objects.filter(id__in=reservations).delete()
+
+        self.stdout.write(
+            f"{result['booked']} bookings in {result['elapsed_s']:.2f}s, "
+            f"{result['bookings_per_second']:.1f} bookings/s, "
+            f"{result['conflicts']} conflicts, {result['errors']} errors"
+        )
+        output = Path(
+            options["output"]
+            or Path("benchmarks") / f"booking-{timezone.now():%Y%m%dT%H%M%S}.json"
+        )
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(
+            json.dumps(
+                {
+                    "commit": ApiBenchmark.get_commit(),
+                    "created_at": timezone.now().isoformat(),
+                    "database": connection.vendor,
+                    "buyers": options["buyers"],
+                    "seats": options["seats"],
+                    **result,
+                },
+                indent=2,
+            )
+        )
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+    def run_buyers(self, show_session, users, options, target) -> dict:
+        dome = show_session.planetarium_dome
+        count = options["seats"]
+        barrier = threading.Barrier(options["buyers"])
+        lock = threading.Lock()
+        counts = {"booked": 0, "conflicts": 0, "errors": 0}
+        latencies = []
+
+        def buy(user, seed):
+            rng = random.Random(seed)
+            try:
+                barrier.wait()
+                while True:
+                    with lock:
+                        if counts["booked"] >= target:
+                            return
+                    row = rng.randint(1, dome.rows)
+                    first = rng.randint(1, dome.seats_in_row - count + 1)
+                    started = time.perf_counter()
+                    try:
+                        book_tickets(
+                            [
+                                {"show_session": show_session, "row": row, "seat": seat}
+                                for seat in range(first, first + count)
+                            ],
+                            user=user,
+                        )
+                        outcome = "booked"
+                    except SeatsTaken:
+                        outcome = "conflicts"
+                    except Exception as error:
+                        outcome = "errors"
+                        self.stderr.write(f"{type(error).__name__}: {error}")
+                    with lock:
+                        counts[outcome] += 1
+                        if outcome == "booked":
+                            latencies.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=buy, args=(users[index % len(users)], index))
+            for index in range(options["buyers"])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            **counts,
+            "elapsed_s": elapsed,
+            "bookings_per_second": counts["booked"] / elapsed,
+            "p50_ms": latencies[len(latencies) // 2] if latencies else None,
+            "p99_ms": latencies[len(latencies) * 99 // 100] if latencies else None,
+        }
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from planetarium.openapi import build_schema, get_settings
+
+
+class Command(BaseCommand):
+    """Django command to prebuild the OpenAPI schema served by api/schema/"""
+
+    help = (
+        "Generates the OpenAPI document once and stores it gzipped as YAML "
+        "and JSON under a content-derived version, for api/schema/ and the "
+        "Swagger/Redoc pages."
+    )
+
+    def handle(self, *args, **options):
+        if not get_settings()["SPECTACULAR_RUNTIME"]:
+            raise CommandError(
+                "Schema annotations are not loaded, run with "
+                "OPENAPI_SPECTACULAR_RUNTIME=1"
+            )
+        version = build_schema()
+        self.stdout.write(self.style.SUCCESS(f"Built OpenAPI schema {version}"))
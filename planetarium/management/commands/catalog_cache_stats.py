@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from planetarium.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    """Django command to show hit/miss statistics of the catalog cache"""
+
+    help = "Prints hit/miss statistics of the catalog response cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Reset the counters after printing them.",
+        )
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        self.stdout.write(
+            f"hits: {stats['hits']}\n"
+            f"misses: {stats['misses']}\n"
+            f"hit ratio: {stats['hit_ratio']:.2%}"
+        )
+        if options["reset"]:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset"))
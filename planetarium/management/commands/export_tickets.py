@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from planetarium.dates import show_time_range
+from planetarium.exports import CHUNK_SIZE, WRITERS, ticket_rows
+
+
+class Command(BaseCommand):
+    """Django command to export tickets for reporting"""
+
+    help = (
+        "Writes every ticket with its reservation, user, show and dome as CSV "
+        "or NDJSON, reading the tickets in chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", help="First show day.")
+        parser.add_argument("--to", dest="date_to", help="Last show day, included.")
+        parser.add_argument("--format", choices=WRITERS, default="csv")
+        parser.add_argument("--output", help="Output file (default: stdout).")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            show_time_from, show_time_to = show_time_range(
+                {"from": options["date_from"], "to": options["date_to"]}
+            )
+        except ValidationError as error:
+            raise CommandError(
+                " ".join(
+                    f"--{name}: {message}" for name, message in error.detail.items()
+                )
+            )
+
+        rows = ticket_rows(show_time_from, show_time_to, options["chunk_size"])
+        lines = WRITERS[options["format"]](rows)
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as file:
+                file.writelines(lines)
+        else:
+            for chunk in lines:
+                self.stdout.write(chunk, ending="")
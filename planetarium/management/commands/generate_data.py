@@ -0,0 +1,212 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from planetarium.analytics import rebuild_daily_occupancy
+from planetarium.cache import bump_version
+from planetarium.importing import raw_timestamps
+from planetarium.models import (
+    AstronomyShow,
+    PlanetariumDome,
+    Reservation,
+    ShowSession,
+    ShowTheme,
+    Ticket,
+)
+from planetarium.seating import SeatMap
+
+WORDS = (
+    "Cosmic Stellar Galactic Lunar Solar Nebula Quasar Pulsar Orbit Comet "
+    "Eclipse Aurora Horizon Zenith Meteor Nova Infinity Voyage Odyssey Dawn"
+).split()
+
+
+class Command(BaseCommand):
+    """Django command to fill the database with synthetic benchmark data"""
+
+    help = (
+        "Generates shows, domes, sessions, users, reservations and tickets "
+        "at a configurable scale using bulk inserts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--themes", type=int, default=30)
+        parser.add_argument("--domes", type=int, default=20)
+        parser.add_argument("--shows", type=int, default=2000)
+        parser.add_argument("--sessions", type=int, default=100_000)
+        parser.add_argument("--users", type=int, default=20_000)
+        parser.add_argument(
+            "--fill",
+            type=float,
+            default=0.4,
+            help="Average share of sold seats per session (0-1).",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=3 * 365,
+            help="Sessions are spread over this many days around today.",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--email-prefix",
+            default="bench",
+            help="Generated users get <prefix><n>@example.com emails.",
+        )
+
+    def handle(self, *args, **options):
+        if options["sessions"] and not (
+            options["domes"] and options["shows"] and options["users"]
+        ):
+            raise CommandError("Sessions need at least one dome, show and user")
+
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+
+        themes = ShowTheme.objects.bulk_create(
+            ShowTheme(name=f"{self.title(2)} {index}")
+            for index in range(options["themes"])
+        )
+        domes = PlanetariumDome.objects.bulk_create(
+            PlanetariumDome(
+                name=f"{self.title(1)} Dome {index}",
+                rows=self.random.randint(8, 30),
+                seats_in_row=self.random.randint(8, 35),
+            )
+            for index in range(options["domes"])
+        )
+        shows = self.create_shows(options["shows"], themes)
+        user_ids = self.create_users(options["users"], options["email_prefix"])
+        self.stdout.write(
+            f"Created {len(themes)} themes, {len(domes)} domes, "
+            f"{len(shows)} shows, {len(user_ids)} users"
+        )
+
+        created_sessions = created_tickets = 0
+        while created_sessions < options["sessions"]:
+            count = min(self.batch_size, options["sessions"] - created_sessions)
+            created_tickets += self.create_sessions(
+                count, shows, domes, user_ids, options["fill"], options["days"]
+            )
+            created_sessions += count
+            self.stdout.write(
+                f"{created_sessions} sessions, {created_tickets} tickets", ending="\r"
+            )
+
+        # Bulk inserts skip the signals that keep the rollups and the cached
+        # catalog responses in step
+        rebuild_daily_occupancy()
+        for model in (AstronomyShow, PlanetariumDome, ShowTheme):
+            bump_version(model)
+        self.stdout.write("")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {created_sessions} sessions and {created_tickets} tickets"
+            )
+        )
+
+    def title(self, words: int) -> str:
+        return " ".join(self.random.sample(WORDS, words))
+
+    def create_shows(self, count, themes):
+        shows = []
+        for start in range(0, count, self.batch_size):
+            batch = AstronomyShow.objects.bulk_create(
+                AstronomyShow(
+                    title=self.title(3),
+                    description=" ".join(self.random.choices(WORDS, k=30)),
+                )
+                for _ in range(start, min(start + self.batch_size, count))
+            )
+            AstronomyShow.show_themes.through.objects.bulk_create(
+                AstronomyShow.show_themes.through(
+                    astronomyshow_id=show.id, showtheme_id=theme.id
+                )
+                for show in batch
+                for theme in self.random.sample(themes, min(len(themes), 2))
+            )
+            shows += batch
+        return shows
+
+    def create_users(self, count, prefix):
+        user_model = get_user_model()
+        password = make_password("password")
+        user_ids = []
+        for start in range(0, count, self.batch_size):
+            user_ids += [
+                user.id
+                for user in user_model.objects.bulk_create(
+                    user_model(email=f"{prefix}{index}@example.com", password=password)
+                    for index in range(start, min(start + self.batch_size, count))
+                )
+            ]
+        return user_ids
+
+    def create_sessions(self, count, shows, domes, user_ids, fill, days) -> int:
+        """Creates sessions with their reservations and tickets, returns tickets"""
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        sessions, sold_places = [], []
+        for _ in range(count):
+            dome = self.random.choice(domes)
+            capacity = dome.rows * dome.seats_in_row
+            sold = int(capacity * min(1.0, self.random.uniform(0, 2 * fill)))
+            places = sorted(
+                divmod(index, dome.seats_in_row)
+                for index in self.random.sample(range(capacity), sold)
+            )
+            places = [(row + 1, seat + 1) for row, seat in places]
+            sessions.append(
+                ShowSession(
+                    show_time=now
+                    + timedelta(hours=self.random.randint(-days * 12, days * 12)),
+                    astronomy_show=self.random.choice(shows),
+                    planetarium_dome=dome,
+                    occupancy=SeatMap.from_places(
+                        dome.rows, dome.seats_in_row, places
+                    ).to_bytes(),
+                    tickets_sold=len(places),
+                )
+            )
+            sold_places.append(places)
+
+        with transaction.atomic():
+            sessions = ShowSession.objects.bulk_create(sessions)
+
+            groups = []
+            for session, places in zip(sessions, sold_places):
+                while places:
+                    size = self.random.randint(1, 4)
+                    groups.append((session, places[:size]))
+                    places = places[size:]
+
+            # Spread reservations over the month before each session instead
+            # of stamping them all with the generation time
+            with raw_timestamps(Reservation):
+                reservations = Reservation.objects.bulk_create(
+                    Reservation(
+                        user_id=self.random.choice(user_ids),
+                        created_at=session.show_time
+                        - timedelta(minutes=self.random.randint(1, 30 * 24 * 60)),
+                    )
+                    for session, _ in groups
+                )
+            tickets = Ticket.objects.bulk_create(
+                (
+                    Ticket(
+                        show_session=session,
+                        reservation=reservation,
+                        row=row,
+                        seat=seat,
+                    )
+                    for reservation, (session, places) in zip(reservations, groups)
+                    for row, seat in places
+                ),
+                batch_size=self.batch_size * 5,
+            )
+        return len(tickets)
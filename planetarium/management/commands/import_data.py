@@ -0,0 +1,315 @@
+import io
+import json
+import os
+from itertools import islice
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+
+from planetarium.analytics import rebuild_daily_occupancy
+from planetarium.cache import bump_version
+from planetarium.importing import (
+    READERS,
+    RecordBuilder,
+    copy_field_value,
+    dependency_levels,
+    raw_timestamps,
+)
+from planetarium.models import (
+    AstronomyShow,
+    PlanetariumDome,
+    ShowSession,
+    ShowTheme,
+    Ticket,
+)
+
+CATALOG_MODELS = (AstronomyShow, PlanetariumDome, ShowTheme)
+EXTENSIONS = {".json": "json", ".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv"}
+
+
+class Command(BaseCommand):
+    """Django command to stream large fixtures into the database in batches"""
+
+    help = (
+        "Imports a JSON fixture, NDJSON or CSV file without loading it into "
+        "memory. Rows are inserted in checkpointed batches with bulk inserts "
+        "(COPY on Postgres), then seat counters are rebuilt."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=READERS)
+        parser.add_argument(
+            "--model",
+            help="app_label.ModelName of the rows, required for CSV files.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording the progress, an interrupted import resumes "
+            "from it.",
+        )
+        parser.add_argument(
+            "--skip-invalid",
+            action="store_true",
+            help="Skip rows with unknown references or seats outside the dome "
+            "instead of stopping.",
+        )
+        parser.add_argument(
+            "--no-sync",
+            action="store_true",
+            help="Do not rebuild seat counters after the import.",
+        )
+
+    def handle(self, *args, **options):
+        self.path = Path(options["path"]).resolve()
+        self.format = options["format"] or EXTENSIONS.get(self.path.suffix)
+        if self.format is None:
+            raise CommandError("Unknown file format, pass --format")
+        if self.format == "csv" and not options["model"]:
+            raise CommandError("CSV imports need --model")
+        self.model_label = options["model"]
+        self.batch_size = options["batch_size"]
+        self.skip_invalid = options["skip_invalid"]
+        self.checkpoint_path = options["checkpoint"]
+        self.use_copy = connection.vendor == "postgresql"
+        self.sync = not options["no_sync"]
+
+        levels = self.get_levels()
+        self.builders = {model: RecordBuilder(model) for model in levels}
+        checkpoint = self.load_checkpoint()
+        imported = skipped = 0
+
+        for level in range(checkpoint["level"], max(levels.values()) + 1):
+            level_models = {model for model, value in levels.items() if value == level}
+            consumed = checkpoint["records"] if level == checkpoint["level"] else 0
+            records = islice(self.read(), consumed, None)
+
+            while True:
+                batch = []
+                for record in records:
+                    consumed += 1
+                    model = self.get_model(record["model"])
+                    if model in level_models:
+                        batch.append((consumed, model, record))
+                        if len(batch) == self.batch_size:
+                            break
+                if not batch:
+                    break
+
+                created, rejected = self.import_batch(batch)
+                imported += created
+                skipped += rejected
+                self.save_checkpoint(level, consumed)
+                self.stdout.write(f"{imported} rows imported", ending="\r")
+
+        self.finish(list(levels))
+        message = f"Imported {imported} rows"
+        if skipped:
+            message += f", skipped {skipped} invalid rows"
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def read(self):
+        with open(self.path, encoding="utf-8", newline="") as stream:
+            if self.format == "csv":
+                yield from READERS["csv"](stream, self.model_label)
+            else:
+                yield from READERS[self.format](stream)
+
+    def get_model(self, label):
+        try:
+            return apps.get_model(label)
+        except (LookupError, ValueError):
+            raise CommandError(f"Unknown model {label}")
+
+    def get_levels(self) -> dict:
+        """Import passes per model, referenced models are imported first"""
+        if self.format == "csv":
+            labels = {self.model_label}
+        else:
+            labels = {record["model"] for record in self.read()}
+        try:
+            return dependency_levels({self.get_model(label) for label in labels})
+        except ValueError as error:
+            raise CommandError(error)
+
+    def load_checkpoint(self) -> dict:
+        start = {"level": 0, "records": 0}
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return start
+        with open(self.checkpoint_path) as file:
+            checkpoint = json.load(file)
+        if checkpoint.get("source") != str(self.path):
+            raise CommandError("The checkpoint belongs to another file")
+        self.stdout.write(
+            f"Resuming pass {checkpoint['level']} after "
+            f"{checkpoint['records']} records"
+        )
+        return checkpoint
+
+    def save_checkpoint(self, level, records):
+        if not self.checkpoint_path:
+            return
+        temporary = f"{self.checkpoint_path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(
+                {"source": str(self.path), "level": level, "records": records}, file
+            )
+        os.replace(temporary, self.checkpoint_path)
+
+    def import_batch(self, batch) -> tuple:
+        """Validates and inserts one batch in its own transaction"""
+        objects, errors = {}, []
+        for position, model, record in batch:
+            try:
+                obj, obj_relations = self.builders[model].build(record)
+            except (ValueError, TypeError) as error:
+                errors.append(f"record {position}: {error}")
+                continue
+            obj._import_position = position
+            obj._import_relations = obj_relations
+            objects.setdefault(model, []).append(obj)
+
+        for model, model_objects in objects.items():
+            # Like loaddata, a later record with the same pk replaces the earlier
+            model_objects = list(
+                {
+                    obj.pk if obj.pk is not None else id(obj): obj
+                    for obj in model_objects
+                }.values()
+            )
+            invalid = self.find_invalid(model, model_objects)
+            errors += invalid.values()
+            objects[model] = [obj for obj in model_objects if id(obj) not in invalid]
+
+        if errors and not self.skip_invalid:
+            raise CommandError(
+                "Invalid rows, nothing from this batch was imported:\n"
+                + "\n".join(errors[:10])
+            )
+        for error in errors:
+            self.stderr.write(f"Skipped {error}")
+
+        created = 0
+        try:
+            with transaction.atomic():
+                for model, model_objects in objects.items():
+                    self.insert(model, model_objects)
+                    created += len(model_objects)
+                    through_rows = {}
+                    for obj in model_objects:
+                        rows = self.builders[model].through_rows(
+                            obj, obj._import_relations
+                        )
+                        for through, through_objects in rows.items():
+                            through_rows.setdefault(through, []).extend(through_objects)
+                    for through, through_objects in through_rows.items():
+                        through.objects.bulk_create(through_objects)
+        except IntegrityError as error:
+            raise CommandError(
+                f"Batch ending at record {batch[-1][0]} conflicts with existing "
+                f"rows: {error}"
+            )
+        return created, len(errors)
+
+    def find_invalid(self, model, objects) -> dict:
+        """Rows with unknown references, one query per relation of the batch"""
+        invalid = {}
+        for field in model._meta.concrete_fields:
+            if not field.is_relation:
+                continue
+            ids = {getattr(obj, field.attname) for obj in objects} - {None}
+            existing = set(
+                field.related_model._base_manager.filter(pk__in=ids).values_list(
+                    "pk", flat=True
+                )
+            )
+            for obj in objects:
+                value = getattr(obj, field.attname)
+                if value is None and not field.null:
+                    invalid[id(obj)] = f"record {obj._import_position}: no {field.name}"
+                elif value is not None and value not in existing:
+                    invalid[id(obj)] = (
+                        f"record {obj._import_position}: "
+                        f"{field.name} {value} does not exist"
+                    )
+
+        if model is Ticket:
+            invalid.update(self.find_invalid_seats(objects))
+        return invalid
+
+    @staticmethod
+    def find_invalid_seats(tickets) -> dict:
+        dome_sizes = {
+            show_session_id: (rows, seats_in_row)
+            for show_session_id, rows, seats_in_row in ShowSession.objects.filter(
+                pk__in={ticket.show_session_id for ticket in tickets}
+            ).values_list(
+                "pk", "planetarium_dome__rows", "planetarium_dome__seats_in_row"
+            )
+        }
+        invalid, places = {}, set()
+        for ticket in tickets:
+            rows, seats_in_row = dome_sizes.get(ticket.show_session_id, (0, 0))
+            place = (ticket.show_session_id, ticket.row, ticket.seat)
+            if not (1 <= ticket.row <= rows and 1 <= ticket.seat <= seats_in_row):
+                invalid[id(ticket)] = (
+                    f"record {ticket._import_position}: seat {ticket.row}/"
+                    f"{ticket.seat} is outside the dome"
+                )
+            elif place in places:
+                invalid[id(ticket)] = (
+                    f"record {ticket._import_position}: seat {ticket.row}/"
+                    f"{ticket.seat} is sold twice"
+                )
+            places.add(place)
+        return invalid
+
+    def insert(self, model, objects):
+        if not objects:
+            return
+        if not self.use_copy or any(obj.pk is None for obj in objects):
+            with raw_timestamps(model):
+                model.objects.bulk_create(objects)
+            return
+
+        fields = model._meta.concrete_fields
+        buffer = io.StringIO()
+        for obj in objects:
+            buffer.write(
+                "\t".join(copy_field_value(field, obj, connection) for field in fields)
+            )
+            buffer.write("\n")
+        buffer.seek(0)
+
+        quote_name = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {quote_name(model._meta.db_table)} "
+                f"({', '.join(quote_name(field.column) for field in fields)}) "
+                f"FROM STDIN",
+                buffer,
+            )
+
+    def finish(self, import_models):
+        """Resets id sequences, cached catalog responses, seat counters and rollups"""
+        statements = connection.ops.sequence_reset_sql(no_style(), import_models)
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+
+        for model in CATALOG_MODELS:
+            if model in import_models:
+                bump_version(model)
+
+        if self.sync and {ShowSession, Ticket} & set(import_models):
+            out = io.StringIO()
+            call_command("sync_seat_counters", "--repair", stdout=out)
+            self.stdout.write(out.getvalue().strip().splitlines()[-1])
+            rebuild_daily_occupancy()
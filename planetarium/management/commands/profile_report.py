@@ -0,0 +1,87 @@
+import json
+import pstats
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planetarium.profiling import get_settings
+
+SORT_COLUMNS = {"tottime": 2, "cumtime": 3}
+
+
+class Command(BaseCommand):
+    """Django command to merge request profiles into a hot-path report"""
+
+    help = (
+        "Merges the cProfile dumps written by ProfilingMiddleware and prints "
+        "the top functions of every view."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directory",
+            help="Profile directory (default: REQUEST_PROFILING['DIRECTORY']).",
+        )
+        parser.add_argument("--top", type=int, default=15)
+        parser.add_argument("--sort", choices=SORT_COLUMNS, default="tottime")
+        parser.add_argument("--view", help="Only report views containing this.")
+        parser.add_argument("--output", help="Also write the report as JSON.")
+
+    def handle(self, *args, **options):
+        directory = Path(options["directory"] or get_settings()["DIRECTORY"])
+        if not directory.is_dir():
+            raise CommandError(f"No profiles found in {directory}")
+
+        report = {}
+        for view_directory in sorted(directory.iterdir()):
+            dumps = sorted(view_directory.glob("*.prof"))
+            if not dumps or (
+                options["view"] and options["view"] not in view_directory.name
+            ):
+                continue
+            report[view_directory.name] = self.rank(
+                dumps, SORT_COLUMNS[options["sort"]], options["top"]
+            )
+
+        for view_name, view_report in report.items():
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"{view_name} ({view_report['requests']} requests, "
+                    f"per request averages)"
+                )
+            )
+            self.stdout.write(
+                f"{'calls':>10} {'tottime ms':>11} {'cumtime ms':>11}  function"
+            )
+            for row in view_report["functions"]:
+                self.stdout.write(
+                    f"{row['calls']:>10.1f} {row['tottime_ms']:>11.3f} "
+                    f"{row['cumtime_ms']:>11.3f}  {row['function']}"
+                )
+            self.stdout.write("")
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2))
+            self.stdout.write(
+                self.style.SUCCESS(f"Report written to {options['output']}")
+            )
+
+    @staticmethod
+    def rank(dumps, sort_column, top) -> dict:
+        stats = pstats.Stats(*(str(dump) for dump in dumps))
+        requests = len(dumps)
+        rows = sorted(
+            stats.stats.items(), key=lambda item: item[1][sort_column], reverse=True
+        )
+        return {
+            "requests": requests,
+            "functions": [
+                {
+                    "function": pstats.func_std_string(function),
+                    "calls": calls / requests,
+                    "tottime_ms": total_time * 1000 / requests,
+                    "cumtime_ms": cumulative_time * 1000 / requests,
+                }
+                for function, (_, calls, total_time, cumulative_time, _) in rows[:top]
+            ],
+        }
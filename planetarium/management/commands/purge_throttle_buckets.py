@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from planetarium.models import ThrottleBucket
+
+
+class Command(BaseCommand):
+    """Django command to delete throttle buckets that have refilled"""
+
+    help = (
+        "Deletes throttle buckets not used for longer than the longest "
+        "throttle period. They are full again, so no limit is reset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=60 * 60 * 24,
+            help="Seconds since the last request, at least the longest "
+            "throttle period (a day by default).",
+        )
+
+    def handle(self, *args, **options):
+        deleted, _ = ThrottleBucket.objects.filter(
+            checked_at__lt=time.time() - options["older_than"]
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} throttle buckets"))
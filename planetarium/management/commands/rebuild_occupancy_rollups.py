@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from planetarium.analytics import rebuild_daily_occupancy
+
+
+class Command(BaseCommand):
+    """Django command to recompute the daily occupancy rollups"""
+
+    help = (
+        "Rebuilds the per show, dome and day occupancy rollups from the "
+        "show session counters."
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_daily_occupancy()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} occupancy rollups"))
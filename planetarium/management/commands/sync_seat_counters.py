@@ -0,0 +1,100 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from planetarium.models import ShowSession, Ticket
+from planetarium.seating import SeatMap
+
+
+class Command(BaseCommand):
+    """Django command to verify sold seat counters and seat maps of sessions"""
+
+    help = (
+        "Compares tickets_sold and the seat map of every show session "
+        "with its tickets and optionally repairs the drifted ones. "
+        "Archived sessions have no live tickets and are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Rewrite counters and seat maps that do not match the tickets.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Number of show sessions checked per query.",
+        )
+
+    def handle(self, *args, **options):
+        checked = drifted = 0
+        last_id = 0
+        while True:
+            show_sessions = list(
+                ShowSession.objects.select_related("planetarium_dome")
+                .filter(id__gt=last_id, archived_at__isnull=True)
+                .order_by("id")[: options["batch_size"]]
+            )
+            if not show_sessions:
+                break
+            last_id = show_sessions[-1].id
+
+            places = defaultdict(list)
+            for show_session_id, row, seat in Ticket.objects.filter(
+                show_session__in=show_sessions
+            ).values_list("show_session_id", "row", "seat"):
+                places[show_session_id].append((row, seat))
+
+            for show_session in show_sessions:
+                checked += 1
+                if not self.has_drifted(show_session, places[show_session.id]):
+                    continue
+
+                drifted += 1
+                self.stdout.write(
+                    f"Show session {show_session.id}: "
+                    f"tickets_sold={show_session.tickets_sold}, "
+                    f"tickets={len(places[show_session.id])}"
+                )
+                if options["repair"]:
+                    self.repair(show_session.id)
+
+        message = f"Checked {checked} show sessions, {drifted} drifted"
+        if options["repair"] and drifted:
+            message += ", repaired"
+        self.stdout.write(self.style.SUCCESS(message))
+
+    @staticmethod
+    def has_drifted(show_session, places) -> bool:
+        dome = show_session.planetarium_dome
+        try:
+            stored = SeatMap(dome.rows, dome.seats_in_row, show_session.occupancy)
+        except ValueError:
+            return True
+
+        expected = SeatMap.empty(dome.rows, dome.seats_in_row)
+        for row, seat in places:
+            try:
+                expected.take(row, seat)
+            except IndexError:
+                continue
+        return (
+            stored.to_bytes() != expected.to_bytes()
+            or show_session.tickets_sold != expected.count()
+        )
+
+    @staticmethod
+    def repair(show_session_id):
+        with transaction.atomic():
+            show_session = (
+                ShowSession.objects.select_for_update(of=("self",))
+                .select_related("planetarium_dome")
+                .get(id=show_session_id)
+            )
+            seat_map = show_session.build_seat_map()
+            show_session.occupancy = seat_map.to_bytes()
+            show_session.tickets_sold = seat_map.count()
+            show_session.save(update_fields=["occupancy", "tickets_sold", "updated_at"])
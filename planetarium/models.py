@@ -1,11 +1,18 @@
 import os
+import struct
+import time
 import uuid
+from collections import defaultdict
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import F
+from django.utils import timezone
 from django.utils.text import slugify
 
+from planetarium.seating import SeatMap
+
 
 class ShowTheme(models.Model):
     name = models.CharField(max_length=64)
@@ -28,6 +35,9 @@ class AstronomyShow(models.Model):
         ShowTheme, blank=True, related_name="show_themes"
     )
     image = models.ImageField(null=True, upload_to=astronomy_show_image_file_path)
+    # Set by the worker pool once every resized variant of the image is stored
+    images_ready = models.BooleanField(default=False, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.title
@@ -37,6 +47,7 @@ class PlanetariumDome(models.Model):
     name = models.CharField(max_length=64)
     rows = models.PositiveIntegerField()
     seats_in_row = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
@@ -47,19 +58,186 @@ class PlanetariumDome(models.Model):
 
 
 class ShowSession(models.Model):
-    show_time = models.DateTimeField()
+    show_time = models.DateTimeField(db_index=True)
     astronomy_show = models.ForeignKey(
         AstronomyShow, on_delete=models.CASCADE, related_name="show_sessions"
     )
     planetarium_dome = models.ForeignKey(
         PlanetariumDome, on_delete=models.CASCADE, related_name="show_sessions"
     )
+    occupancy = models.BinaryField(default=bytes, editable=False)
+    tickets_sold = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Set once the tickets have been moved to TicketArchive
+    archived_at = models.DateTimeField(null=True, editable=False)
 
     def __str__(self):
         return self.astronomy_show.title + " " + str(self.show_time)
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.occupancy:
+            self.occupancy = SeatMap.empty(
+                self.planetarium_dome.rows, self.planetarium_dome.seats_in_row
+            ).to_bytes()
+        elif not self._state.adding and not args and "update_fields" not in kwargs:
+            # The seat counters are written by update_seat_maps and the
+            # archive mark by archive_show_sessions only, an edit of a stale
+            # instance must not overwrite them
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in ("occupancy", "tickets_sold", "archived_at")
+            ]
+        return super().save(*args, **kwargs)
+
+    def get_seat_map(self) -> SeatMap:
+        try:
+            return SeatMap(
+                self.planetarium_dome.rows,
+                self.planetarium_dome.seats_in_row,
+                self.occupancy,
+            )
+        except ValueError:
+            return self.build_seat_map()
+
+    def build_seat_map(self) -> SeatMap:
+        """Rebuilds the seat map of the session from its sold tickets"""
+        rows = self.planetarium_dome.rows
+        seats_in_row = self.planetarium_dome.seats_in_row
+        places = list(
+            self.tickets.filter(row__lte=rows, seat__lte=seats_in_row).values_list(
+                "row", "seat"
+            )
+        )
+        if self.archived_at is not None:
+            for archived in TicketArchive.objects.filter(show_session=self):
+                places += [
+                    (row, seat)
+                    for row, seat in archived.get_places()
+                    if row <= rows and seat <= seats_in_row
+                ]
+        return SeatMap.from_places(rows, seats_in_row, places)
+
+    @classmethod
+    def rebuild_seat_maps(cls, show_sessions) -> int:
+        """Rebuilds seat maps and counters of the sessions from their tickets.
+
+        Needed when the dome geometry changes: stored maps are laid out for
+        the old one, and a map of the same byte size would be read with the
+        wrong seats. Tickets outside the new geometry are left out. Returns
+        the number of sessions.
+        """
+        show_sessions = list(
+            show_sessions.select_for_update(of=("self",))
+            .select_related("planetarium_dome")
+            .order_by("id")
+        )
+        places = defaultdict(list)
+        for show_session_id, row, seat in Ticket.objects.filter(
+            show_session__in=show_sessions
+        ).values_list("show_session_id", "row", "seat"):
+            places[show_session_id].append((row, seat))
+        for archived in TicketArchive.objects.filter(
+            show_session__in=[
+                show_session
+                for show_session in show_sessions
+                if show_session.archived_at is not None
+            ]
+        ):
+            places[archived.show_session_id] += archived.get_places()
+
+        now = timezone.now()
+        for show_session in show_sessions:
+            dome = show_session.planetarium_dome
+            seat_map = SeatMap.empty(dome.rows, dome.seats_in_row)
+            for row, seat in places[show_session.id]:
+                try:
+                    seat_map.take(row, seat)
+                except IndexError:
+                    continue
+            show_session.occupancy = seat_map.to_bytes()
+            show_session.tickets_sold = seat_map.count()
+            show_session.updated_at = now
+        cls.objects.bulk_update(
+            show_sessions, ["occupancy", "tickets_sold", "updated_at"], batch_size=500
+        )
+        return len(show_sessions)
+
+    @classmethod
+    def update_seat_maps(cls, places, taken: bool) -> list:
+        """Marks (show_session_id, row, seat) places as taken or free.
+
+        Keeps the seat map and the tickets_sold counter of every affected
+        session in step and returns the places that already were in the
+        requested state. Must run inside a transaction: the sessions are
+        locked in id order and stay locked until it commits.
+        """
+        places = list(places)
+        show_sessions = {
+            show_session.id: show_session
+            for show_session in cls.objects.select_for_update(of=("self",))
+            .select_related("planetarium_dome")
+            .filter(id__in={show_session_id for show_session_id, _, _ in places})
+            .order_by("id")
+        }
+        seat_maps = {
+            show_session_id: show_session.get_seat_map()
+            for show_session_id, show_session in show_sessions.items()
+        }
+        unchanged = []
+        for show_session_id, row, seat in places:
+            seat_map = seat_maps.get(show_session_id)
+            if seat_map is None:
+                continue
+            try:
+                if seat_map.is_taken(row, seat) == taken:
+                    unchanged.append((show_session_id, row, seat))
+                elif taken:
+                    seat_map.take(row, seat)
+                else:
+                    seat_map.release(row, seat)
+            except IndexError:
+                continue
+
+        now = timezone.now()
+        sold_changes = []
+        for show_session_id, show_session in show_sessions.items():
+            tickets_sold = seat_maps[show_session_id].count()
+            if tickets_sold != show_session.tickets_sold:
+                sold_changes.append(
+                    (show_session.rollup_key, tickets_sold - show_session.tickets_sold)
+                )
+            show_session.occupancy = seat_maps[show_session_id].to_bytes()
+            show_session.tickets_sold = tickets_sold
+            show_session.updated_at = now
+        cls.objects.bulk_update(
+            show_sessions.values(), ["occupancy", "tickets_sold", "updated_at"]
+        )
+        # Sorted so concurrent bookings lock the rollup rows in the same order
+        for key, tickets_sold in sorted(sold_changes):
+            DailyOccupancy.apply(key, tickets_sold=tickets_sold)
+        return unchanged
+
+    @property
+    def rollup_key(self) -> tuple:
+        """(day, astronomy_show_id, planetarium_dome_id) of the daily rollup"""
+        # show_time may still be the string or naive value it was created with
+        show_time = self._meta.get_field("show_time").to_python(self.show_time)
+        if timezone.is_naive(show_time):
+            show_time = timezone.make_aware(show_time)
+        return (
+            timezone.localtime(show_time).date(),
+            self.astronomy_show_id,
+            self.planetarium_dome_id,
+        )
+
     class Meta:
         ordering = ["-show_time"]
+        indexes = [
+            models.Index(fields=["astronomy_show", "show_time"]),
+            models.Index(fields=["planetarium_dome", "show_time"]),
+        ]
 
 
 class Reservation(models.Model):
@@ -71,6 +249,7 @@ class Reservation(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["user", "created_at", "id"])]
 
 
 class Ticket(models.Model):
@@ -126,3 +305,186 @@ class Ticket(models.Model):
     class Meta:
         unique_together = ("show_session", "row", "seat")
         ordering = ["row", "seat"]
+
+
+class TicketArchive(models.Model):
+    """Tickets of a reservation for an archived show session, packed.
+
+    ``places`` holds the (row, seat) pairs as big-endian 16-bit numbers,
+    four bytes per ticket instead of a ticket row with its indexes.
+    """
+
+    PLACE = struct.Struct(">HH")
+
+    reservation = models.ForeignKey(
+        Reservation, on_delete=models.CASCADE, related_name="archived_tickets"
+    )
+    show_session = models.ForeignKey(
+        ShowSession, on_delete=models.CASCADE, related_name="+"
+    )
+    places = models.BinaryField()
+
+    class Meta:
+        unique_together = ("reservation", "show_session")
+
+    @classmethod
+    def pack_places(cls, places) -> bytes:
+        return b"".join(cls.PLACE.pack(row, seat) for row, seat in places)
+
+    def get_places(self) -> list:
+        return list(self.PLACE.iter_unpack(bytes(self.places)))
+
+
+class SeatHold(models.Model):
+    """Seat kept for a user for a few minutes, nobody else can book it"""
+
+    show_session = models.ForeignKey(
+        ShowSession, on_delete=models.CASCADE, related_name="seat_holds"
+    )
+    row = models.PositiveIntegerField()
+    seat = models.PositiveIntegerField()
+    user = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="+"
+    )
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("show_session", "row", "seat")
+        indexes = [models.Index(fields=["show_session", "expires_at"])]
+
+
+class DailyOccupancy(models.Model):
+    """Sessions, seats and sold tickets per show, dome and day.
+
+    Kept in step with the show sessions on every booking, so occupancy
+    reports never aggregate the ticket table.
+    """
+
+    day = models.DateField()
+    astronomy_show = models.ForeignKey(
+        AstronomyShow, on_delete=models.CASCADE, related_name="+"
+    )
+    planetarium_dome = models.ForeignKey(
+        PlanetariumDome, on_delete=models.CASCADE, related_name="+"
+    )
+    sessions = models.IntegerField(default=0)
+    capacity = models.IntegerField(default=0)
+    tickets_sold = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("day", "astronomy_show", "planetarium_dome")
+        indexes = [models.Index(fields=["day"])]
+
+    @classmethod
+    def apply(cls, key, sessions=0, capacity=0, tickets_sold=0):
+        """Adds the changes to the rollup row of a (day, show, dome) key"""
+        day, astronomy_show_id, planetarium_dome_id = key
+        rollups = cls.objects.filter(
+            day=day,
+            astronomy_show_id=astronomy_show_id,
+            planetarium_dome_id=planetarium_dome_id,
+        )
+        changes = {
+            "sessions": F("sessions") + sessions,
+            "capacity": F("capacity") + capacity,
+            "tickets_sold": F("tickets_sold") + tickets_sold,
+        }
+        if rollups.update(**changes):
+            if sessions < 0:
+                rollups.filter(sessions__lte=0).delete()
+            return
+        # Removals of a missing row come from cascades that delete it anyway
+        if min(sessions, capacity, tickets_sold) < 0:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    day=day,
+                    astronomy_show_id=astronomy_show_id,
+                    planetarium_dome_id=planetarium_dome_id,
+                    sessions=sessions,
+                    capacity=capacity,
+                    tickets_sold=tickets_sold,
+                )
+        except IntegrityError:
+            rollups.update(**changes)
+
+
+class ThrottleBucket(models.Model):
+    """Token bucket of a throttle key, shared by every worker.
+
+    One fixed-size row per key: ``tokens`` refill continuously up to the
+    rate's request count and every allowed request takes one.
+    """
+
+    key = models.CharField(max_length=255, primary_key=True)
+    tokens = models.FloatField()
+    checked_at = models.FloatField(db_index=True)
+    allowed = models.BooleanField(default=True)
+
+    # Scalar min/max of the backends with INSERT ... ON CONFLICT ... RETURNING
+    UPSERT_FUNCTIONS = {"postgresql": ("LEAST", "GREATEST"), "sqlite": ("MIN", "MAX")}
+
+    @classmethod
+    def take(cls, key, capacity, refill_rate, now=None, using=None) -> tuple:
+        """Takes a token if there is one, returns (allowed, tokens left).
+
+        ``refill_rate`` is in tokens per second. On Postgres and SQLite the
+        check is a single upsert; other backends lock the row instead.
+        """
+        now = time.time() if now is None else now
+        using = using or router.db_for_write(cls)
+        connection = connections[using]
+        if connection.vendor not in cls.UPSERT_FUNCTIONS:
+            return cls._take_locked(key, capacity, refill_rate, now, using)
+
+        least, greatest = cls.UPSERT_FUNCTIONS[connection.vendor]
+        quote_name = connection.ops.quote_name
+        table = quote_name(cls._meta.db_table)
+        key_column, tokens, checked_at, allowed = (
+            quote_name(cls._meta.get_field(name).column)
+            for name in ("key", "tokens", "checked_at", "allowed")
+        )
+        refill = (
+            f"{least}(%s, {table}.{tokens} + {greatest}(0, "
+            f"excluded.{checked_at} - {table}.{checked_at}) * %s)"
+        )
+        first_allowed = capacity >= 1
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({key_column}, {tokens}, {checked_at}, "
+                f"{allowed}) VALUES (%s, %s, %s, %s) "
+                f"ON CONFLICT ({key_column}) DO UPDATE SET "
+                f"{tokens} = CASE WHEN {refill} >= 1 THEN {refill} - 1 "
+                f"ELSE {refill} END, "
+                f"{allowed} = {refill} >= 1, "
+                f"{checked_at} = excluded.{checked_at} "
+                f"RETURNING {allowed}, {tokens}",
+                [
+                    key,
+                    capacity - 1 if first_allowed else capacity,
+                    now,
+                    first_allowed,
+                    *(capacity, refill_rate) * 4,
+                ],
+            )
+            is_allowed, tokens_left = cursor.fetchone()
+        return bool(is_allowed), tokens_left
+
+    @classmethod
+    def _take_locked(cls, key, capacity, refill_rate, now, using) -> tuple:
+        with transaction.atomic(using=using):
+            bucket = (
+                cls.objects.using(using).select_for_update().filter(key=key).first()
+            )
+            if bucket is None:
+                bucket = cls(key=key, tokens=capacity, checked_at=now)
+            else:
+                elapsed = max(0, now - bucket.checked_at)
+                bucket.tokens = min(capacity, bucket.tokens + elapsed * refill_rate)
+            bucket.allowed = bucket.tokens >= 1
+            if bucket.allowed:
+                bucket.tokens -= 1
+            bucket.checked_at = now
+            bucket.save(using=using)
+        return bucket.allowed, bucket.tokens
@@ -0,0 +1,197 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.shortcuts import render
+from django.urls import reverse
+from django.utils import timezone
+from django.views import View
+
+DEFAULT_SETTINGS = {
+    "SPECTACULAR_RUNTIME": True,
+    "DIRECTORY": "openapi",
+    "MAX_AGE": 300,
+    "SWAGGER_UI_DIST": "https://cdn.jsdelivr.net/npm/swagger-ui-dist@latest",
+    "REDOC_DIST": "https://cdn.jsdelivr.net/npm/redoc@latest",
+}
+FORMATS = {
+    "yaml": "application/vnd.oai.openapi",
+    "json": "application/vnd.oai.openapi+json",
+}
+MANIFEST = "manifest.json"
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def get_settings() -> dict:
+    return {**DEFAULT_SETTINGS, **getattr(settings, "OPENAPI_SCHEMA", {})}
+
+
+if get_settings()["SPECTACULAR_RUNTIME"]:
+    from drf_spectacular.types import OpenApiTypes  # noqa: F401
+    from drf_spectacular.utils import (  # noqa: F401
+        OpenApiParameter,
+        extend_schema,
+        extend_schema_field,
+    )
+else:
+    # Annotations only matter to the schema generator, which is not loaded
+
+    def extend_schema(*args, **kwargs):
+        return lambda target: target
+
+    extend_schema_field = extend_schema
+
+    class OpenApiParameter:
+        def __init__(self, name, *args, **kwargs):
+            self.name = name
+
+    class _OpenApiTypes:
+        def __getattr__(self, name):
+            return name
+
+    OpenApiTypes = _OpenApiTypes()
+
+
+def artifact_path(name: str) -> str:
+    return os.path.join(get_settings()["DIRECTORY"], name)
+
+
+def render_schema() -> dict:
+    """The OpenAPI document in every format, generated by drf-spectacular"""
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    return {
+        "yaml": OpenApiYamlRenderer().render(schema, renderer_context={}),
+        "json": OpenApiJsonRenderer().render(schema, renderer_context={}),
+    }
+
+
+def build_schema() -> str:
+    """Writes the gzipped documents and their manifest, returns the version.
+
+    The version is a digest of the document, so unchanged code keeps its
+    version and the URLs cached by browsers stay valid.
+    """
+    documents = render_schema()
+    version = hashlib.sha256(documents["json"]).hexdigest()[:16]
+    directory = get_settings()["DIRECTORY"]
+    os.makedirs(directory, exist_ok=True)
+
+    for schema_format, document in documents.items():
+        temporary = artifact_path(f"openapi-{version}.{schema_format}.gz.tmp")
+        with open(temporary, "wb") as file:
+            file.write(gzip.compress(document, mtime=0))
+        os.replace(temporary, temporary[: -len(".tmp")])
+
+    temporary = artifact_path(f"{MANIFEST}.tmp")
+    with open(temporary, "w") as file:
+        json.dump({"version": version, "created_at": timezone.now().isoformat()}, file)
+    os.replace(temporary, artifact_path(MANIFEST))
+
+    for name in os.listdir(directory):
+        if name.startswith("openapi-") and f"-{version}." not in name:
+            os.remove(os.path.join(directory, name))
+    return version
+
+
+def load_schema():
+    """(version, {format: gzipped document}) of the built artifact or None.
+
+    Loaded once per process and again when the manifest is rebuilt.
+    """
+    try:
+        modified = os.stat(artifact_path(MANIFEST)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _lock:
+        if _loaded.get("modified") != modified:
+            with open(artifact_path(MANIFEST)) as file:
+                version = json.load(file)["version"]
+            documents = {}
+            for schema_format in FORMATS:
+                with open(
+                    artifact_path(f"openapi-{version}.{schema_format}.gz"), "rb"
+                ) as file:
+                    documents[schema_format] = file.read()
+            _loaded.clear()
+            _loaded.update(modified=modified, schema=(version, documents))
+        return _loaded["schema"]
+
+
+def get_schema():
+    """The built schema, built on first use while drf-spectacular is loaded"""
+    schema = load_schema()
+    if schema is None and get_settings()["SPECTACULAR_RUNTIME"]:
+        build_schema()
+        schema = load_schema()
+    if schema is None:
+        raise Http404("The OpenAPI schema is not built, run build_openapi_schema")
+    return schema
+
+
+class SchemaView(View):
+    """Serves the prebuilt OpenAPI document, gzipped when the client accepts it.
+
+    ``api/schema/`` is revalidated with its ETag after ``MAX_AGE`` seconds;
+    versioned URLs never change and are cached for a year.
+    """
+
+    def get(self, request, version=None):
+        current, documents = get_schema()
+        if version is not None and version != current:
+            raise Http404("Unknown schema version")
+
+        schema_format = request.GET.get("format")
+        if schema_format not in FORMATS:
+            accept = request.headers.get("Accept", "")
+            schema_format = "json" if "json" in accept else "yaml"
+        etag = f'"{current}-{schema_format}"'
+
+        if version is not None:
+            cache_control = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            cache_control = f"public, max-age={get_settings()['MAX_AGE']}"
+
+        if request.headers.get("If-None-Match") == etag:
+            response = HttpResponseNotModified()
+        else:
+            document = documents[schema_format]
+            if "gzip" in request.headers.get("Accept-Encoding", ""):
+                response = HttpResponse(document, content_type=FORMATS[schema_format])
+                response["Content-Encoding"] = "gzip"
+            else:
+                response = HttpResponse(
+                    gzip.decompress(document), content_type=FORMATS[schema_format]
+                )
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        response["Vary"] = "Accept, Accept-Encoding"
+        return response
+
+
+class SchemaDocsView(View):
+    """Swagger UI or Redoc page loading the versioned, cacheable schema"""
+
+    template_name = None
+    dist_setting = None
+
+    def get(self, request):
+        version, _ = get_schema()
+        return render(
+            request,
+            self.template_name,
+            {
+                "dist": get_settings()[self.dist_setting],
+                "schema_url": reverse("schema-version", args=[version])
+                + "?format=json",
+            },
+        )
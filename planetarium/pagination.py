@@ -0,0 +1,89 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """Cursor pagination over a (field, "id") ordering.
+
+    DRF's CursorPagination keeps only the first ordering field in the
+    cursor and steps over rows sharing its value with an OFFSET. Here the
+    cursor holds both values, so every page starts with a
+    (field, id) < (value, id) comparison and no OFFSET, however many rows
+    share a timestamp.
+    """
+
+    ordering = ("-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        current_position = None if self.cursor is None else self.cursor.position
+
+        if reverse:
+            queryset = queryset.order_by(
+                *(
+                    order[1:] if order.startswith("-") else f"-{order}"
+                    for order in self.ordering
+                )
+            )
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(queryset.model, current_position, reverse)
+            )
+
+        # One extra row tells whether a page follows
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_position_filter(self, model, position: str, reverse: bool) -> Q:
+        """Rows after position in the (reversed if reverse) page ordering"""
+        order = self.ordering[0]
+        field_name = order.lstrip("-")
+        value, _, pk = position.rpartition("|")
+        try:
+            value = model._meta.get_field(field_name).to_python(value)
+            pk = int(pk)
+        except (ValidationError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        lookup = "lt" if reverse != order.startswith("-") else "gt"
+        return Q(**{f"{field_name}__{lookup}": value}) | Q(
+            **{field_name: value, f"id__{lookup}": pk}
+        )
+
+    def _get_position_from_instance(self, instance, ordering):
+        # Unique per row, so DRF's link building never needs an offset
+        position = super()._get_position_from_instance(instance, ordering)
+        return f"{position}|{instance.id}"
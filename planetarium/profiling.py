@@ -0,0 +1,75 @@
+import cProfile
+import os
+import random
+import re
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+DEFAULT_SETTINGS = {
+    "ENABLED": False,
+    # Profile one request out of EVERY, 0 turns sampling off
+    "EVERY": 1000,
+    # Requests whose path matches one of these patterns are always profiled
+    "PATHS": (),
+    # Requests sending this header are always profiled, None turns it off
+    "HEADER": None,
+    "DIRECTORY": "profiles",
+}
+
+
+def get_settings() -> dict:
+    return {**DEFAULT_SETTINGS, **getattr(settings, "REQUEST_PROFILING", {})}
+
+
+def view_directory_name(request) -> str:
+    match = request.resolver_match
+    name = match.view_name if match else "unresolved"
+    return re.sub(r"[^\w.-]", "_", name)
+
+
+class ProfilingMiddleware:
+    """Runs cProfile on a sample of requests and dumps the stats per view.
+
+    Dumps go to ``<DIRECTORY>/<view name>/`` and are merged into a ranked
+    report by the ``profile_report`` management command.
+    """
+
+    def __init__(self, get_response):
+        options = get_settings()
+        if not options["ENABLED"]:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.every = options["EVERY"]
+        self.paths = [re.compile(pattern) for pattern in options["PATHS"]]
+        self.header = options["HEADER"]
+        self.directory = Path(options["DIRECTORY"])
+
+    def should_profile(self, request) -> bool:
+        if self.header and self.header in request.headers:
+            return True
+        if any(pattern.search(request.path) for pattern in self.paths):
+            return True
+        return bool(self.every) and random.randrange(self.every) == 0
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+
+        directory = self.directory / view_directory_name(request)
+        directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(
+            directory / f"{int(time.time())}-{os.getpid()}-{uuid.uuid4().hex[:8]}.prof"
+        )
+        return response
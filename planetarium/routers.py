@@ -0,0 +1,128 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "ALIASES": [],
+    "PIN_SECONDS": 10,
+    "RETRY_SECONDS": 30,
+    "PIN_CACHE": "default",
+}
+EVERYONE = "all"
+
+_read_alias = ContextVar("read_alias", default=None)
+_unhealthy_until = {}
+
+
+def get_settings() -> dict:
+    return {**DEFAULT_SETTINGS, **getattr(settings, "READ_REPLICAS", {})}
+
+
+def pin_key(user_id) -> str:
+    return f"replica-pin:{user_id}"
+
+
+def pin_to_primary(user=None):
+    """Sends the reads of the user, or of everyone, to the primary for a while.
+
+    Replicas may lag behind, so whoever wrote reads the primary until the
+    change has most likely been replicated.
+    """
+    options = get_settings()
+    if not options["ALIASES"]:
+        return
+    if user is not None and not user.is_authenticated:
+        return
+    caches[options["PIN_CACHE"]].set(
+        pin_key(EVERYONE if user is None else user.pk),
+        True,
+        timeout=options["PIN_SECONDS"],
+    )
+
+
+def is_pinned(user) -> bool:
+    keys = [pin_key(EVERYONE)]
+    if user.is_authenticated:
+        keys.append(pin_key(user.pk))
+    return bool(caches[get_settings()["PIN_CACHE"]].get_many(keys))
+
+
+def healthy_replica():
+    """A reachable replica alias, None when every replica is down"""
+    options = get_settings()
+    aliases = list(options["ALIASES"])
+    random.shuffle(aliases)
+    now = time.monotonic()
+    for alias in aliases:
+        if _unhealthy_until.get(alias, 0) > now:
+            continue
+        try:
+            connections[alias].ensure_connection()
+        except OperationalError:
+            logger.warning("Replica %s is unreachable, reading from the primary", alias)
+            _unhealthy_until[alias] = now + options["RETRY_SECONDS"]
+            continue
+        return alias
+    return None
+
+
+class ReplicaRouter:
+    """Routes the reads of replica-enabled requests to their replica.
+
+    Everything else, writes included, goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_settings()["ALIASES"]
+
+
+class ReplicaReadMixin:
+    """Reads safe requests of ``replica_actions`` from a healthy replica.
+
+    Authentication, permissions and throttles still run on the primary.
+    Users are pinned to the primary for a while after a successful write,
+    and requests fall back to it inside a transaction or when no replica is
+    reachable.
+    """
+
+    replica_actions = ("list", "retrieve")
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            get_settings()["ALIASES"]
+            and request.method in SAFE_METHODS
+            and self.action in self.replica_actions
+            # Reads within a transaction of the primary must see its writes
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+            and not is_pinned(request.user)
+        ):
+            alias = healthy_replica()
+            if alias is not None:
+                self._read_alias_token = _read_alias.set(alias)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "_read_alias_token", None)
+        if token is not None:
+            _read_alias.reset(token)
+            self._read_alias_token = None
+        elif request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
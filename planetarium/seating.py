@@ -0,0 +1,120 @@
+import base64
+
+
+class SeatMap:
+    """Packed seat occupancy of a show session, one bit per seat.
+
+    Seats are laid out row by row using the dome geometry: seat ``(row, seat)``
+    is bit ``(row - 1) * seats_in_row + (seat - 1)``, counted from the most
+    significant bit of the first byte.
+    """
+
+    def __init__(self, rows: int, seats_in_row: int, bitmap: bytes = b""):
+        self.rows = rows
+        self.seats_in_row = seats_in_row
+        size = self.size_for(rows, seats_in_row)
+        if len(bitmap) != size:
+            raise ValueError(
+                f"Seat map of {len(bitmap)} bytes does not fit "
+                f"{rows}x{seats_in_row} dome ({size} bytes)"
+            )
+        self.bitmap = bytearray(bitmap)
+
+    @staticmethod
+    def size_for(rows: int, seats_in_row: int) -> int:
+        return (rows * seats_in_row + 7) // 8
+
+    @classmethod
+    def empty(cls, rows: int, seats_in_row: int) -> "SeatMap":
+        return cls(rows, seats_in_row, bytes(cls.size_for(rows, seats_in_row)))
+
+    @classmethod
+    def from_places(cls, rows: int, seats_in_row: int, places) -> "SeatMap":
+        seat_map = cls.empty(rows, seats_in_row)
+        for row, seat in places:
+            seat_map.take(row, seat)
+        return seat_map
+
+    def _position(self, row: int, seat: int) -> tuple:
+        if not (1 <= row <= self.rows and 1 <= seat <= self.seats_in_row):
+            raise IndexError(f"No seat {seat} in row {row}")
+        index = (row - 1) * self.seats_in_row + (seat - 1)
+        return index >> 3, 0x80 >> (index & 7)
+
+    def is_taken(self, row: int, seat: int) -> bool:
+        byte, mask = self._position(row, seat)
+        return bool(self.bitmap[byte] & mask)
+
+    def take(self, row: int, seat: int):
+        byte, mask = self._position(row, seat)
+        self.bitmap[byte] |= mask
+
+    def release(self, row: int, seat: int):
+        byte, mask = self._position(row, seat)
+        self.bitmap[byte] &= ~mask
+
+    def taken_places(self):
+        """Yields (row, seat) of every taken seat ordered by row and seat"""
+        for byte_index, byte in enumerate(self.bitmap):
+            if not byte:
+                continue
+            for bit in range(8):
+                if byte & (0x80 >> bit):
+                    row, seat = divmod(byte_index * 8 + bit, self.seats_in_row)
+                    yield row + 1, seat + 1
+
+    def find_block(self, count: int):
+        """(row, first seat) of the best block of ``count`` adjacent free seats.
+
+        Blocks closer to the middle row and the middle of their row are
+        better. Every row is scanned with a few integer operations: the free
+        seats are ANDed with shifted copies of themselves, doubling the run
+        length each time, until only the starts of long enough runs remain.
+        Returns None when no row has such a block.
+        """
+        if not 1 <= count <= self.seats_in_row:
+            return None
+        width = self.seats_in_row
+        full = (1 << width) - 1
+        whole = int.from_bytes(self.bitmap, "big")
+        total = len(self.bitmap) * 8
+        # Bit position of the block's last seat when it is centered
+        center = width - count - (width - count) // 2
+        best, best_score = None, None
+
+        for row in range(1, self.rows + 1):
+            free = ~(whole >> (total - row * width)) & full
+            runs, length = free, 1
+            while length * 2 <= count:
+                runs &= runs >> length
+                length *= 2
+            if length < count:
+                runs &= runs >> (count - length)
+            if not runs:
+                continue
+
+            # Nearest set bit to the center, looking down and up from it
+            below = runs & ((1 << (center + 1)) - 1)
+            above = runs >> center
+            candidates = []
+            if below:
+                candidates.append(below.bit_length() - 1)
+            if above:
+                candidates.append(center + (above & -above).bit_length() - 1)
+            position = min(candidates, key=lambda bit: abs(2 * bit - width + count))
+
+            # Doubled distances from the middle, which may fall between seats
+            row_offset = abs(2 * row - self.rows - 1)
+            score = (row_offset + abs(2 * position - width + count), row_offset)
+            if best_score is None or score < best_score:
+                best, best_score = (row, width - count - position + 1), score
+        return best
+
+    def count(self) -> int:
+        return int.from_bytes(self.bitmap, "big").bit_count()
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.bitmap)
+
+    def to_base64(self) -> str:
+        return base64.b64encode(self.bitmap).decode("ascii")
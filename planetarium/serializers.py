@@ -1,7 +1,12 @@
-from django.db import transaction
+from django.core.files.storage import default_storage
+from django.urls import reverse
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueTogetherValidator
 
+from planetarium.booking import book_tickets
+from planetarium.images import FORMATS, VARIANTS, variant_name
 from planetarium.models import (
     AstronomyShow,
     ShowSession,
@@ -10,6 +15,7 @@ from planetarium.models import (
     Ticket,
     Reservation,
 )
+from planetarium.openapi import extend_schema_field
 
 
 class ShowThemeSerializer(serializers.ModelSerializer):
@@ -24,22 +30,80 @@ class AstronomyShowSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+@extend_schema_field(
+    {
+        "type": "object",
+        "nullable": True,
+        "additionalProperties": {
+            "type": "object",
+            "additionalProperties": {"type": "string", "format": "uri"},
+        },
+    }
+)
+class ImageVariantsField(serializers.ReadOnlyField):
+    """URLs of the resized poster variants, {variant: {format: url}}.
+
+    Variants still being rendered link to an endpoint that renders them on
+    first request.
+    """
+
+    # Columns read by values_list() lists besides the serialized fields
+    row_lookups = ("images_ready",)
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "*"
+        super().__init__(**kwargs)
+
+    def to_representation(self, astronomy_show):
+        if not astronomy_show.image:
+            return None
+
+        name = astronomy_show.image.name
+        ready = astronomy_show.images_ready
+        request = self.context.get("request")
+        urls = {}
+        for variant in VARIANTS:
+            urls[variant] = {}
+            for image_format in FORMATS:
+                if ready:
+                    url = default_storage.url(variant_name(name, variant, image_format))
+                else:
+                    url = reverse(
+                        "planetarium:astronomyshow-image-variant",
+                        args=[astronomy_show.id, variant, image_format],
+                    )
+                urls[variant][image_format] = (
+                    request.build_absolute_uri(url) if request else url
+                )
+        return urls
+
+
 class AstronomyShowListSerializer(serializers.ModelSerializer):
     show_themes = serializers.SlugRelatedField(
         many=True, read_only=True, slug_field="name"
     )
+    images = ImageVariantsField()
+
+    class Meta:
+        model = AstronomyShow
+        fields = ("id", "title", "description", "show_themes", "image", "images")
+
+
+class AstronomyShowImageSerializer(serializers.ModelSerializer):
+    images = ImageVariantsField()
 
     class Meta:
         model = AstronomyShow
-        fields = ("id", "title", "description", "show_themes", "image")
+        fields = ("id", "image", "images")
 
 
 class AstronomyShowDetailSerializer(serializers.ModelSerializer):
     show_themes = ShowThemeSerializer(many=True, read_only=True)
+    images = ImageVariantsField()
 
     class Meta:
         model = AstronomyShow
-        fields = ("id", "title", "description", "show_themes", "image")
+        fields = ("id", "title", "description", "show_themes", "image", "images")
 
 
 class PlanetariumDomeSerializer(serializers.ModelSerializer):
@@ -78,10 +142,59 @@ class ShowSessionListSerializer(ShowSessionSerializer):
         )
 
 
+class ShowSessionPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    """Looks show sessions up in the batch preloaded by the ticket list"""
+
+    def to_internal_value(self, data):
+        show_sessions = self.context.get("show_sessions")
+        if show_sessions is None:
+            return super().to_internal_value(data)
+
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            show_session = show_sessions.get(int(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if show_session is None:
+            self.fail("does_not_exist", pk_value=data)
+        return show_session
+
+
+class TicketBulkListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.context["show_sessions"] = self.preload_show_sessions(data)
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def preload_show_sessions(data):
+        """Fetches every referenced show session with its dome in one query"""
+        show_session_ids = set()
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            try:
+                show_session_ids.add(int(item.get("show_session")))
+            except (TypeError, ValueError):
+                continue
+
+        return (
+            ShowSession.objects.select_related("planetarium_dome")
+            .filter(archived_at__isnull=True)
+            .in_bulk(show_session_ids)
+        )
+
+
 class TicketSerializer(serializers.ModelSerializer):
+    show_session = ShowSessionPrimaryKeyField(
+        queryset=ShowSession.objects.select_related("planetarium_dome").filter(
+            archived_at__isnull=True
+        )
+    )
+
     def validate(self, attrs):
         data = super(TicketSerializer, self).validate(attrs=attrs)
-        print(data)
         Ticket.validate_ticket(
             attrs["row"],
             attrs["seat"],
@@ -93,6 +206,10 @@ class TicketSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ticket
         fields = ("id", "row", "seat", "show_session")
+        list_serializer_class = TicketBulkListSerializer
+        # Seat uniqueness is checked for the whole reservation at once
+        # in ReservationSerializer.validate_tickets
+        validators = []
 
 
 class TicketSeatsSerializer(TicketSerializer):
@@ -104,14 +221,57 @@ class TicketSeatsSerializer(TicketSerializer):
 class ShowSessionDetailSerializer(ShowSessionSerializer):
     movie = AstronomyShowListSerializer(many=False, read_only=True)
     planetarium_dome = PlanetariumDomeSerializer(many=False, read_only=True)
-    taken_places = TicketSeatsSerializer(
-        source="tickets", many=True, read_only=True
-    )
+    taken_places = serializers.SerializerMethodField()
 
     class Meta:
         model = ShowSession
         fields = ("id", "show_time", "movie", "planetarium_dome", "taken_places")
 
+    @extend_schema_field(TicketSeatsSerializer(many=True))
+    def get_taken_places(self, show_session):
+        return [
+            {"row": row, "seat": seat}
+            for row, seat in show_session.get_seat_map().taken_places()
+        ]
+
+
+class ShowSessionSeatMapSerializer(serializers.ModelSerializer):
+    rows = serializers.IntegerField(source="planetarium_dome.rows", read_only=True)
+    seats_in_row = serializers.IntegerField(
+        source="planetarium_dome.seats_in_row", read_only=True
+    )
+    encoding = serializers.SerializerMethodField()
+    seat_map = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ShowSession
+        fields = ("id", "rows", "seats_in_row", "encoding", "seat_map")
+
+    def get_encoding(self, show_session) -> str:
+        return "base64"
+
+    def get_seat_map(self, show_session) -> str:
+        return show_session.get_seat_map().to_base64()
+
+
+class ShowSessionAvailabilitySerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    show_time = serializers.DateTimeField()
+    astronomy_show = serializers.IntegerField()
+    planetarium_dome = serializers.IntegerField()
+    capacity = serializers.IntegerField()
+    tickets_available = serializers.IntegerField()
+    seat_map = serializers.CharField(
+        required=False, help_text="Base64 seat map, only with ?seat_map=true"
+    )
+
+
+class BestSeatsSerializer(serializers.Serializer):
+    show_session = serializers.IntegerField()
+    row = serializers.IntegerField(allow_null=True)
+    seats = serializers.ListField(child=serializers.IntegerField())
+    held_until = serializers.DateTimeField(allow_null=True)
+
 
 class TicketListSerializer(TicketSerializer):
     show_session = ShowSessionListSerializer(many=False, read_only=True)
@@ -124,14 +284,53 @@ class ReservationSerializer(serializers.ModelSerializer):
         model = Reservation
         fields = ("id", "tickets", "created_at")
 
+    def validate_tickets(self, tickets):
+        """Rejects seats that are already sold or repeated in the request"""
+        message = UniqueTogetherValidator.message.format(
+            field_names=", ".join(Ticket._meta.unique_together[0])
+        )
+
+        seat_maps = {}
+        requested_places = set()
+        errors = []
+        for ticket in tickets:
+            show_session = ticket["show_session"]
+            if show_session.id not in seat_maps:
+                seat_maps[show_session.id] = show_session.get_seat_map()
+
+            place = (show_session.id, ticket["row"], ticket["seat"])
+            if place in requested_places or seat_maps[show_session.id].is_taken(
+                ticket["row"], ticket["seat"]
+            ):
+                errors.append({api_settings.NON_FIELD_ERRORS_KEY: [message]})
+            else:
+                errors.append({})
+            requested_places.add(place)
+
+        if any(errors):
+            raise ValidationError(errors, code="unique")
+        return tickets
+
     def create(self, validated_data):
-        with transaction.atomic():
-            tickets_data = validated_data.pop("tickets")
-            reservation = Reservation.objects.create(**validated_data)
-            for ticket_data in tickets_data:
-                Ticket.objects.create(reservation=reservation, **ticket_data)
-            return reservation
+        tickets_data = validated_data.pop("tickets")
+        return book_tickets(tickets_data, **validated_data)
 
 
 class ReservationListSerializer(ReservationSerializer):
-    tickets = TicketSerializer(many=True, read_only=True)
+    tickets = serializers.SerializerMethodField()
+
+    @extend_schema_field(TicketSerializer(many=True))
+    def get_tickets(self, reservation):
+        """Live tickets followed by the ones of archived show sessions"""
+        tickets = TicketSerializer(reservation.tickets.all(), many=True).data
+        for archived in reservation.archived_tickets.all():
+            tickets.extend(
+                {
+                    "id": None,
+                    "row": row,
+                    "seat": seat,
+                    "show_session": archived.show_session_id,
+                }
+                for row, seat in archived.get_places()
+            )
+        return tickets
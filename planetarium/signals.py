@@ -0,0 +1,224 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from planetarium.analytics import rebuild_daily_occupancy
+from planetarium.cache import bump_version
+from planetarium.models import (
+    AstronomyShow,
+    DailyOccupancy,
+    PlanetariumDome,
+    ShowSession,
+    ShowTheme,
+    Ticket,
+)
+
+_deleting = threading.local()
+
+
+def deleting_show_session_ids() -> set:
+    """Show sessions being deleted by this thread, with their tickets"""
+    if not hasattr(_deleting, "show_session_ids"):
+        _deleting.show_session_ids = set()
+    return _deleting.show_session_ids
+
+
+@receiver(pre_save, sender=Ticket)
+def remember_previous_place(sender, instance, **kwargs):
+    instance._previous_place = None
+    if instance.pk is not None:
+        instance._previous_place = (
+            Ticket.objects.filter(pk=instance.pk)
+            .values_list("show_session_id", "row", "seat")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Ticket)
+def take_ticket_seat(sender, instance, **kwargs):
+    place = (instance.show_session_id, instance.row, instance.seat)
+    previous_place = getattr(instance, "_previous_place", None)
+    if previous_place == place:
+        return
+
+    with transaction.atomic():
+        if previous_place is not None:
+            ShowSession.update_seat_maps([previous_place], taken=False)
+        ShowSession.update_seat_maps([place], taken=True)
+
+
+@receiver(post_delete, sender=Ticket)
+def release_ticket_seat(sender, instance, **kwargs):
+    if instance.show_session_id in deleting_show_session_ids():
+        # The session takes its sold tickets out of the rollup at once
+        return
+    with transaction.atomic():
+        ShowSession.update_seat_maps(
+            [(instance.show_session_id, instance.row, instance.seat)], taken=False
+        )
+
+
+@receiver(post_save, sender=ShowTheme)
+@receiver(post_delete, sender=ShowTheme)
+@receiver(post_save, sender=AstronomyShow)
+@receiver(post_delete, sender=AstronomyShow)
+@receiver(post_save, sender=PlanetariumDome)
+@receiver(post_delete, sender=PlanetariumDome)
+def bump_catalog_version(sender, **kwargs):
+    bump_version(sender)
+
+
+@receiver(m2m_changed, sender=AstronomyShow.show_themes.through)
+def bump_astronomy_show_version(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+
+    bump_version(AstronomyShow)
+    if not reverse:
+        astronomy_shows = AstronomyShow.objects.filter(pk=instance.pk)
+    elif pk_set:
+        astronomy_shows = AstronomyShow.objects.filter(pk__in=pk_set)
+    else:
+        astronomy_shows = AstronomyShow.objects.all()
+    astronomy_shows.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=ShowTheme)
+def touch_themed_astronomy_shows(sender, instance, created, **kwargs):
+    if not created:
+        AstronomyShow.objects.filter(show_themes=instance).update(
+            updated_at=timezone.now()
+        )
+
+
+@receiver(pre_delete, sender=ShowTheme)
+def touch_astronomy_shows_losing_theme(sender, instance, **kwargs):
+    # The cascade removes the m2m rows without sending m2m_changed
+    AstronomyShow.objects.filter(show_themes=instance).update(updated_at=timezone.now())
+
+
+@receiver(pre_save, sender=ShowSession)
+def remember_previous_rollup(sender, instance, **kwargs):
+    instance._previous_rollup = None
+    if instance.pk is not None:
+        instance._previous_rollup = (
+            ShowSession.objects.filter(pk=instance.pk)
+            .values_list(
+                "show_time",
+                "astronomy_show_id",
+                "planetarium_dome_id",
+                "tickets_sold",
+                "planetarium_dome__rows",
+                "planetarium_dome__seats_in_row",
+            )
+            .first()
+        )
+
+
+@receiver(post_save, sender=ShowSession)
+def update_daily_occupancy(sender, instance, update_fields, **kwargs):
+    previous = getattr(instance, "_previous_rollup", None)
+    capacity = instance.planetarium_dome.capacity
+    with transaction.atomic():
+        if previous is None:
+            DailyOccupancy.apply(
+                instance.rollup_key,
+                sessions=1,
+                capacity=capacity,
+                tickets_sold=instance.tickets_sold,
+            )
+            return
+
+        show_time, astronomy_show_id, dome_id, tickets_sold, rows, seats = previous
+        if dome_id != instance.planetarium_dome_id:
+            # The stored seat map is laid out for the previous dome
+            ShowSession.rebuild_seat_maps(ShowSession.objects.filter(pk=instance.pk))
+            instance.refresh_from_db(fields=["occupancy", "tickets_sold"])
+        elif update_fields is not None and "tickets_sold" not in update_fields:
+            instance.tickets_sold = tickets_sold
+        previous_key = (
+            timezone.localtime(show_time).date(),
+            astronomy_show_id,
+            dome_id,
+        )
+        if previous_key == instance.rollup_key:
+            if tickets_sold != instance.tickets_sold:
+                DailyOccupancy.apply(
+                    previous_key, tickets_sold=instance.tickets_sold - tickets_sold
+                )
+            return
+
+        DailyOccupancy.apply(
+            previous_key,
+            sessions=-1,
+            capacity=-rows * seats,
+            tickets_sold=-tickets_sold,
+        )
+        DailyOccupancy.apply(
+            instance.rollup_key,
+            sessions=1,
+            capacity=capacity,
+            tickets_sold=instance.tickets_sold,
+        )
+
+
+@receiver(pre_delete, sender=ShowSession)
+def remember_deleted_show_session(sender, instance, **kwargs):
+    # Sent before any of the cascaded tickets is deleted
+    instance._tickets_sold = (
+        ShowSession.objects.filter(pk=instance.pk)
+        .values_list("tickets_sold", flat=True)
+        .first()
+    )
+    deleting_show_session_ids().add(instance.pk)
+
+
+@receiver(post_delete, sender=ShowSession)
+def remove_from_daily_occupancy(sender, instance, **kwargs):
+    deleting_show_session_ids().discard(instance.pk)
+    try:
+        capacity = instance.planetarium_dome.capacity
+    except PlanetariumDome.DoesNotExist:
+        # The dome is deleted too and its rollups go with it
+        return
+    DailyOccupancy.apply(
+        instance.rollup_key,
+        sessions=-1,
+        capacity=-capacity,
+        tickets_sold=-(getattr(instance, "_tickets_sold", None) or 0),
+    )
+
+
+@receiver(pre_save, sender=PlanetariumDome)
+def remember_previous_geometry(sender, instance, **kwargs):
+    instance._previous_geometry = None
+    if instance.pk is not None:
+        instance._previous_geometry = (
+            PlanetariumDome.objects.filter(pk=instance.pk)
+            .values_list("rows", "seats_in_row")
+            .first()
+        )
+
+
+@receiver(post_save, sender=PlanetariumDome)
+def rebuild_dome_occupancy(sender, instance, created, **kwargs):
+    if created:
+        return
+    show_sessions = ShowSession.objects.filter(planetarium_dome=instance)
+    with transaction.atomic():
+        previous_geometry = getattr(instance, "_previous_geometry", None)
+        if previous_geometry != (instance.rows, instance.seats_in_row):
+            ShowSession.rebuild_seat_maps(show_sessions)
+        rebuild_daily_occupancy(
+            show_sessions,
+            DailyOccupancy.objects.filter(planetarium_dome=instance),
+        )
@@ -0,0 +1,26 @@
+from planetarium.models import AstronomyShow, PlanetariumDome, ShowSession
+
+
+def sample_astronomy_show(**params):
+    defaults = {
+        "title": "Sample title",
+        "description": "Sample description",
+    }
+    defaults.update(params)
+    return AstronomyShow.objects.create(**defaults)
+
+
+def sample_show_session(rows=20, seats_in_row=20, **params):
+    """Creates a session of a new show in a new rows x seats_in_row dome"""
+    defaults = {
+        "show_time": "2023-10-22 14:00:00+00:00",
+    }
+    defaults.update(params)
+    if "astronomy_show" not in defaults:
+        defaults["astronomy_show"] = sample_astronomy_show()
+    if "planetarium_dome" not in defaults:
+        defaults["planetarium_dome"] = PlanetariumDome.objects.create(
+            name="TestDome", rows=rows, seats_in_row=seats_in_row
+        )
+
+    return ShowSession.objects.create(**defaults)
@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from planetarium.admin import EstimatedCountPaginator
+from planetarium.models import (
+    AstronomyShow,
+    PlanetariumDome,
+    Reservation,
+    ShowSession,
+    Ticket,
+)
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@admin.com", "testpassword"
+        )
+        self.client.force_login(self.admin)
+        self.show_session = ShowSession.objects.create(
+            show_time="2023-10-22 14:00:00+00:00",
+            astronomy_show=AstronomyShow.objects.create(
+                title="Sample title", description="Sample description"
+            ),
+            planetarium_dome=PlanetariumDome.objects.create(
+                name="TestDome", rows=10, seats_in_row=10
+            ),
+        )
+        self.reservation = Reservation.objects.create(user=self.admin)
+
+    def add_tickets(self, count):
+        start = Ticket.objects.count()
+        Ticket.objects.bulk_create(
+            Ticket(
+                show_session=self.show_session,
+                reservation=self.reservation,
+                row=index // 10 + 1,
+                seat=index % 10 + 1,
+            )
+            for index in range(start, start + count)
+        )
+
+    def changelist_queries(self, model_name):
+        url = reverse(f"admin:planetarium_{model_name}_changelist")
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        return len(queries)
+
+    def test_ticket_changelist_queries_do_not_grow_with_rows(self):
+        self.add_tickets(5)
+        few = self.changelist_queries("ticket")
+        self.add_tickets(20)
+
+        self.assertEqual(self.changelist_queries("ticket"), few)
+
+    def test_show_session_changelist_filters(self):
+        url = reverse("admin:planetarium_showsession_changelist")
+
+        res = self.client.get(
+            url, {"planetarium_dome__id__exact": self.show_session.planetarium_dome_id}
+        )
+
+        self.assertContains(res, "Sample title")
+
+    def test_ticket_form_has_no_session_select(self):
+        self.add_tickets(1)
+        ticket = Ticket.objects.get()
+
+        res = self.client.get(
+            reverse("admin:planetarium_ticket_change", args=[ticket.id])
+        )
+
+        self.assertContains(res, 'class="vForeignKeyRawIdAdminField"', count=2)
+        self.assertNotContains(res, '<select name="show_session"')
+
+    def test_paginator_counts_exactly_off_postgres_or_small_tables(self):
+        self.add_tickets(3)
+
+        paginator = EstimatedCountPaginator(Ticket.objects.order_by("id"), 100)
+
+        self.assertEqual(paginator.count, 3)
+
+    def test_paginator_estimates_big_tables(self):
+        if connection.vendor != "postgresql":
+            self.skipTest("Estimates come from the Postgres planner")
+        self.add_tickets(50)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Ticket._meta.db_table}")
+
+        paginator = EstimatedCountPaginator(Ticket.objects.order_by("id"), 100)
+        paginator.exact_below = 0
+        filtered = EstimatedCountPaginator(
+            Ticket.objects.filter(row=1).order_by("id"), 100
+        )
+        filtered.exact_below = 0
+
+        self.assertEqual(paginator.count, 50)
+        self.assertGreater(filtered.count, 0)
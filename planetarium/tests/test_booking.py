@@ -0,0 +1,146 @@
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+
+from planetarium.booking import SeatsTaken, book_tickets
+from planetarium.models import (
+    Reservation,
+    ShowSession,
+    Ticket,
+)
+from planetarium.tests.samples import sample_show_session
+
+
+class BookTicketsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "testuser@test.com",
+            "testpassword",
+        )
+        self.show_session = sample_show_session(rows=4, seats_in_row=5)
+
+    def book(self, *places):
+        return book_tickets(
+            [
+                {"show_session": self.show_session, "row": row, "seat": seat}
+                for row, seat in places
+            ],
+            user=self.user,
+        )
+
+    def test_seats_sold_after_validation_reported(self):
+        self.book((1, 1), (1, 2))
+
+        with self.assertRaises(SeatsTaken) as context:
+            self.book((1, 2), (1, 3), (1, 1))
+
+        self.assertEqual(
+            context.exception.detail["seats"],
+            [
+                {"show_session": self.show_session.id, "row": 1, "seat": 1},
+                {"show_session": self.show_session.id, "row": 1, "seat": 2},
+            ],
+        )
+        self.assertEqual(Ticket.objects.count(), 2)
+        self.show_session.refresh_from_db()
+        self.assertEqual(self.show_session.tickets_sold, 2)
+
+    def test_drifted_seat_map_reported_as_seats_taken(self):
+        self.book((2, 2))
+        ShowSession.objects.update(occupancy=bytes(3), tickets_sold=0)
+
+        with self.assertRaises(SeatsTaken) as context:
+            self.book((2, 2), (2, 3))
+
+        self.assertEqual(context.exception.places, [(self.show_session.id, 2, 2)])
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_other_integrity_error_not_reported_as_seats_taken(self):
+        with mock.patch.object(
+            Ticket.objects, "bulk_create", side_effect=IntegrityError("not null")
+        ):
+            with self.assertRaisesMessage(IntegrityError, "not null"):
+                self.book((3, 3))
+
+        self.show_session.refresh_from_db()
+        self.assertEqual(self.show_session.tickets_sold, 0)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentBookingTests(TransactionTestCase):
+    buyers = 8
+
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user(f"buyer{index}@test.com", "password")
+            for index in range(self.buyers)
+        ]
+        self.show_session = sample_show_session(rows=4, seats_in_row=5)
+
+    def test_each_seat_sold_once_under_contention(self):
+        barrier = threading.Barrier(self.buyers)
+        results = []
+
+        def buy(user, places):
+            barrier.wait()
+            try:
+                book_tickets(
+                    [
+                        {"show_session": self.show_session, "row": row, "seat": seat}
+                        for row, seat in places
+                    ],
+                    user=user,
+                )
+                results.append("booked")
+            except SeatsTaken:
+                results.append("taken")
+            finally:
+                connection.close()
+
+        # Every buyer wants two seats, neighbours overlap on one of them
+        threads = [
+            threading.Thread(
+                target=buy, args=(user, [(1, index % 5 + 1), (1, (index + 1) % 5 + 1)])
+            )
+            for index, user in enumerate(self.users)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), self.buyers)
+        self.assertIn("booked", results)
+        sold = list(Ticket.objects.values_list("row", "seat"))
+        self.assertEqual(len(sold), len(set(sold)))
+        self.assertEqual(len(sold), 2 * results.count("booked"))
+        self.show_session.refresh_from_db()
+        self.assertEqual(self.show_session.tickets_sold, len(sold))
+
+    def test_booking_benchmark_reports_throughput(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "booking.json")
+            call_command(
+                "benchmark_booking",
+                "--buyers=4",
+                "--bookings=5",
+                f"--output={output}",
+                stdout=StringIO(),
+            )
+            with open(output) as file:
+                result = json.load(file)
+
+        # Buyers already booking when the target is reached still finish
+        self.assertGreaterEqual(result["booked"], 5)
+        self.assertEqual(result["errors"], 0)
+        self.assertGreater(result["bookings_per_second"], 0)
+        self.assertEqual(ShowSession.objects.count(), 1)
+        self.assertFalse(Reservation.objects.exists())
@@ -0,0 +1,136 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+
+from planetarium.importing import copy_field_value
+from planetarium.management.commands.import_data import Command as ImportCommand
+from planetarium.models import (
+    AstronomyShow,
+    PlanetariumDome,
+    Reservation,
+    ShowSession,
+    Ticket,
+    TicketArchive,
+)
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, "planetarium_db_data.json"
+)
+
+
+class ImportDataTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as file:
+            file.write(content)
+        return path
+
+    def test_fixture_imported_in_dependency_order(self):
+        call_command("import_data", FIXTURE, "--batch-size=25", stdout=StringIO())
+
+        self.assertEqual(Ticket.objects.count(), 20)
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertEqual(AstronomyShow.objects.get(pk=1).show_themes.count(), 2)
+        self.assertEqual(
+            Reservation.objects.get(pk=1).created_at.isoformat(),
+            "2022-08-09T09:06:18.876000+00:00",
+        )
+        for show_session in ShowSession.objects.all():
+            self.assertEqual(show_session.tickets_sold, show_session.tickets.count())
+        PlanetariumDome.objects.create(name="New", rows=1, seats_in_row=1)
+
+    def test_seat_outside_dome_rejected(self):
+        call_command("import_data", FIXTURE, stdout=StringIO())
+        path = self.write(
+            "tickets.csv",
+            "id,show_session,reservation,row,seat\n" "100,1,1,20,20\n" "101,1,1,99,1\n",
+        )
+
+        with self.assertRaisesMessage(CommandError, "99/1 is outside the dome"):
+            call_command(
+                "import_data", path, "--model=planetarium.Ticket", stdout=StringIO()
+            )
+        call_command(
+            "import_data",
+            path,
+            "--model=planetarium.Ticket",
+            "--skip-invalid",
+            stdout=StringIO(),
+            stderr=StringIO(),
+        )
+
+        self.assertTrue(Ticket.objects.filter(pk=100).exists())
+        self.assertFalse(Ticket.objects.filter(pk=101).exists())
+        self.assertEqual(ShowSession.objects.get(pk=1).tickets_sold, 4)
+
+    def test_import_resumes_from_checkpoint(self):
+        path = self.write(
+            "domes.ndjson",
+            "\n".join(
+                json.dumps(
+                    {
+                        "model": "planetarium.planetariumdome",
+                        "pk": pk,
+                        "fields": {"name": f"Dome {pk}", "rows": 5, "seats_in_row": 5},
+                    }
+                )
+                for pk in range(1, 6)
+            ),
+        )
+        checkpoint = self.write(
+            "checkpoint.json",
+            json.dumps({"source": os.path.realpath(path), "level": 0, "records": 3}),
+        )
+
+        call_command(
+            "import_data", path, f"--checkpoint={checkpoint}", stdout=StringIO()
+        )
+
+        self.assertEqual(
+            list(PlanetariumDome.objects.order_by("pk").values_list("pk", flat=True)),
+            [4, 5],
+        )
+
+    def test_binary_copy_value(self):
+        show_session = ShowSession(occupancy=b"\x01\xff")
+
+        value = copy_field_value(
+            ShowSession._meta.get_field("occupancy"), show_session, connection
+        )
+
+        self.assertEqual(value, "\\\\x01ff")
+
+    @skipUnless(connection.vendor == "postgresql", "COPY is only used on Postgres")
+    def test_binary_field_round_trips_through_copy(self):
+        call_command("import_data", FIXTURE, stdout=StringIO())
+        places = TicketArchive.pack_places([(1, 2), (10, 300)])
+        command = ImportCommand()
+        command.use_copy = True
+
+        command.insert(
+            TicketArchive,
+            [
+                TicketArchive(
+                    pk=1,
+                    reservation=Reservation.objects.first(),
+                    show_session=ShowSession.objects.first(),
+                    places=places,
+                )
+            ],
+        )
+
+        archived = TicketArchive.objects.get(pk=1)
+        self.assertEqual(bytes(archived.places), places)
+        self.assertEqual(archived.get_places(), [(1, 2), (10, 300)])
@@ -0,0 +1,95 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from planetarium.instrumentation import RequestMetrics
+from planetarium.tests.samples import sample_show_session
+
+ASTRONOMY_SHOW_URL = reverse("planetarium:astronomyshow-list")
+SHOW_THEME_URL = reverse("planetarium:showtheme-list")
+SHOW_SESSION_URL = reverse("planetarium:showsession-list")
+
+
+@override_settings(REQUEST_TIMING={"ENABLED": True, "SAMPLE_RATE": 1.0})
+class RequestTimingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "testuser@test.com",
+            "testpassword",
+        )
+        self.client.force_authenticate(self.user)
+        sample_show_session()
+
+    def test_server_timing_header_and_log(self):
+        with self.assertLogs("planetarium.requests", "INFO") as logs:
+            res = self.client.get(SHOW_SESSION_URL)
+
+        metrics = {entry.split(";")[0] for entry in res["Server-Timing"].split(", ")}
+        self.assertTrue(
+            {"total", "db", "view", "auth", "throttle", "serialize"} <= metrics
+        )
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["path"], SHOW_SESSION_URL)
+        self.assertGreater(record["queries"], 0)
+
+    def test_repeated_queries_share_fingerprint(self):
+        metrics = RequestMetrics()
+        for sql in (
+            'SELECT * FROM "show" WHERE "id" IN (%s, %s)',
+            'SELECT * FROM "show" WHERE "id" IN (%s)',
+            'SELECT * FROM "show" WHERE "id" IN (%s, %s, %s) LIMIT 21',
+        ):
+            metrics.record_query(lambda *args: None, sql, (), False, {})
+
+        self.assertEqual(
+            metrics.duplicates(threshold=2),
+            {'SELECT * FROM "show" WHERE "id" IN (...)': 2},
+        )
+
+    @override_settings(REQUEST_TIMING={"ENABLED": True, "SAMPLE_RATE": 0})
+    def test_unsampled_request_has_no_header(self):
+        res = self.client.get(SHOW_SESSION_URL)
+
+        self.assertNotIn("Server-Timing", res)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "testuser@test.com",
+            "testpassword",
+        )
+        self.client.force_authenticate(self.user)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_profiled_requests_reported_per_view(self):
+        with override_settings(
+            REQUEST_PROFILING={
+                "ENABLED": True,
+                "EVERY": 0,
+                "HEADER": "X-Profile",
+                "DIRECTORY": self.directory,
+            }
+        ):
+            self.client.get(ASTRONOMY_SHOW_URL, HTTP_X_PROFILE="1")
+            self.client.get(ASTRONOMY_SHOW_URL, HTTP_X_PROFILE="1")
+            self.client.get(SHOW_THEME_URL)
+
+        out = StringIO()
+        call_command("profile_report", f"--directory={self.directory}", stdout=out)
+
+        self.assertIn("planetarium_astronomyshow-list (2 requests", out.getvalue())
+        self.assertNotIn("showtheme-list", out.getvalue())
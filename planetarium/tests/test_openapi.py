@@ -0,0 +1,63 @@
+import gzip
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+
+class OpenApiSchemaTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.settings = override_settings(
+            OPENAPI_SCHEMA={"DIRECTORY": self.directory, "MAX_AGE": 300}
+        )
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+    def test_schema_built_on_first_request(self):
+        res = self.client.get(reverse("schema"))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/vnd.oai.openapi")
+        self.assertEqual(res["Cache-Control"], "public, max-age=300")
+        self.assertTrue(res.content.startswith(b"openapi: 3"))
+
+        not_modified = self.client.get(
+            reverse("schema"), HTTP_IF_NONE_MATCH=res["ETag"]
+        )
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_versioned_schema_is_gzipped_and_immutable(self):
+        out = StringIO()
+        call_command("build_openapi_schema", stdout=out)
+        version = out.getvalue().split()[-1]
+
+        res = self.client.get(
+            reverse("schema-version", args=[version]),
+            {"format": "json"},
+            HTTP_ACCEPT_ENCODING="gzip, br",
+        )
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertIn("immutable", res["Cache-Control"])
+        schema = json.loads(gzip.decompress(res.content))
+        self.assertIn("/api/planetarium/show_sessions/availability/", schema["paths"])
+        self.assertEqual(
+            self.client.get(reverse("schema-version", args=["0" * 16])).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+    def test_docs_load_versioned_schema(self):
+        swagger = self.client.get(reverse("swagger-ui"))
+        redoc = self.client.get(reverse("redoc"))
+
+        with open(f"{self.directory}/manifest.json") as file:
+            version = json.load(file)["version"]
+        self.assertContains(swagger, f"/api/schema/{version}/")
+        self.assertContains(redoc, f'spec-url="/api/schema/{version}/?format=json"')
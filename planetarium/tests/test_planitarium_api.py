@@ -1,49 +1,69 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from django.contrib.auth import get_user_model
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
 from django.urls import reverse
 
-from planetarium.models import AstronomyShow, PlanetariumDome, ShowSession, ShowTheme
+from PIL import Image
+
+from planetarium.cache import (
+    STATS_FLUSH_EVERY,
+    STATS_KEYS,
+    get_stats,
+    get_versions,
+    record_lookup,
+    reset_stats,
+)
+from planetarium.fast_list import ValuesRowSerializer
+from planetarium.images import FORMATS, VARIANTS, generate_variants, variant_name
+from planetarium.models import (
+    AstronomyShow,
+    ShowSession,
+    ShowTheme,
+)
 from planetarium.serializers import (
     AstronomyShowListSerializer,
     AstronomyShowDetailSerializer,
+    ShowSessionListSerializer,
 )
+from planetarium.tests.samples import sample_astronomy_show, sample_show_session
+from planetarium.throttling import ImageVariantRateThrottle
 
 ASTRONOMY_SHOW_URL = reverse("planetarium:astronomyshow-list")
+SHOW_THEME_URL = reverse("planetarium:showtheme-list")
 SHOW_SESSION_URL = reverse("planetarium:showsession-list")
+# The configured catalog cache is a directory shared with running servers
+LOCAL_CACHES = override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "catalog": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "catalog",
+        },
+    }
+)
 
 
 def detail_url(astronomy_show_id: int):
     return reverse("planetarium:astronomyshow-detail", args=[astronomy_show_id])
 
 
-def sample_astronomy_show(**params):
-    defaults = {
-        "title": "Sample title",
-        "description": "Sample description",
-    }
-    defaults.update(params)
-    return AstronomyShow.objects.create(**defaults)
-
-
-def sample_show_session(**params):
-    planetarium_dome = PlanetariumDome.objects.create(
-        name="TestDome", rows=20, seats_in_row=20
-    )
-    defaults = {
-        "show_time": "2023-10-22 14:00:00",
-        "astronomy_show": None,
-        "planetarium_dome": planetarium_dome,
-    }
-
-    defaults.update(params)
-
-    return ShowSession.objects.create(**defaults)
-
-
 class Unauthenticatedastronomy_showApiTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -98,6 +118,34 @@ class Authenticatedastronomy_showApiTests(TestCase):
         self.assertIn(serializer2.data, res.data)
         self.assertNotIn(serializer3.data, res.data)
 
+    def test_filter_astronomy_show_matching_several_themes_listed_once(self):
+        show_theme1 = ShowTheme.objects.create(name="Test theme 1")
+        show_theme2 = ShowTheme.objects.create(name="Test theme 2")
+        astronomy_show = sample_astronomy_show()
+        astronomy_show.show_themes.add(show_theme1, show_theme2)
+
+        res = self.client.get(
+            ASTRONOMY_SHOW_URL, {"themes": f"{show_theme1.id},{show_theme2.id}"}
+        )
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_list_astronomy_shows_query_count_does_not_depend_on_page_size(self):
+        show_theme = ShowTheme.objects.create(name="Test theme")
+        sample_astronomy_show().show_themes.add(show_theme)
+
+        with CaptureQueriesContext(connection) as one_show:
+            self.client.get(ASTRONOMY_SHOW_URL)
+
+        for _ in range(5):
+            sample_astronomy_show().show_themes.add(show_theme)
+
+        with CaptureQueriesContext(connection) as many_shows:
+            res = self.client.get(ASTRONOMY_SHOW_URL)
+
+        self.assertEqual(len(res.data), 6)
+        self.assertEqual(len(one_show), len(many_shows))
+
     def test_filter_astronomy_shows_by_title(self):
         astronomy_show1 = sample_astronomy_show(title="Show")
         astronomy_show2 = sample_astronomy_show(title="Another Show")
@@ -173,3 +221,332 @@ class AdminPlanetariumApiTests(TestCase):
         self.assertEqual(show_themes.count(), 2)
         self.assertIn(showtheme1, show_themes)
         self.assertIn(showtheme2, show_themes)
+
+
+@LOCAL_CACHES
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            "admin@admin.com", "testpassword", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_repeated_list_served_from_cache(self):
+        sample_astronomy_show()
+
+        first = self.client.get(ASTRONOMY_SHOW_URL)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(ASTRONOMY_SHOW_URL)
+
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.data, first.data)
+        # Only the throttle bucket upsert and the aggregate behind the
+        # ETag/Last-Modified validators run
+        self.assertEqual(len(queries), 2)
+
+    def test_query_params_are_part_of_cache_key(self):
+        sample_astronomy_show(title="Show")
+        sample_astronomy_show(title="Other")
+
+        self.client.get(ASTRONOMY_SHOW_URL)
+        res = self.client.get(ASTRONOMY_SHOW_URL, {"title": "Show"})
+
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual(len(res.data), 1)
+
+    def test_create_invalidates_cached_list(self):
+        self.client.get(SHOW_THEME_URL)
+
+        self.client.post(SHOW_THEME_URL, {"name": "New theme"})
+        res = self.client.get(SHOW_THEME_URL)
+
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual([theme["name"] for theme in res.data], ["New theme"])
+
+    def test_generated_data_invalidates_cached_lists(self):
+        self.client.get(SHOW_THEME_URL)
+
+        call_command(
+            "generate_data",
+            "--themes=2",
+            "--domes=0",
+            "--shows=0",
+            "--sessions=0",
+            "--users=0",
+            stdout=StringIO(),
+        )
+        res = self.client.get(SHOW_THEME_URL)
+
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual(len(res.data), 2)
+
+    def test_theme_change_invalidates_cached_shows(self):
+        astronomy_show = sample_astronomy_show()
+        self.client.get(ASTRONOMY_SHOW_URL)
+
+        astronomy_show.show_themes.add(ShowTheme.objects.create(name="Cosmo"))
+        res = self.client.get(ASTRONOMY_SHOW_URL)
+
+        self.assertEqual(res.data[0]["show_themes"], ["Cosmo"])
+
+    def test_version_bumped_again_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            ShowTheme.objects.create(name="Cosmo")
+        # A reader that saw the rows before the commit
+        changed = get_versions([ShowTheme])
+
+        for callback in callbacks:
+            callback()
+
+        self.assertNotEqual(get_versions([ShowTheme]), changed)
+
+    def test_stats_counted_in_process_between_flushes(self):
+        reset_stats()
+        for _ in range(STATS_FLUSH_EVERY - 1):
+            record_lookup(hit=True)
+        record_lookup(hit=False)
+
+        self.assertEqual(caches["catalog"].get(STATS_KEYS["hits"]), 99)
+        record_lookup(hit=True)
+        self.assertEqual(caches["catalog"].get(STATS_KEYS["hits"]), 99)
+        self.assertEqual(get_stats()["hits"], 100)
+        self.assertEqual(get_stats()["misses"], 1)
+
+
+@LOCAL_CACHES
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "testuser@test.com",
+            "testpassword",
+        )
+        self.client.force_authenticate(self.user)
+        self.astronomy_show = sample_astronomy_show()
+
+    def test_list_with_matching_etag_not_modified(self):
+        res = self.client.get(ASTRONOMY_SHOW_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.client.get(
+                ASTRONOMY_SHOW_URL, HTTP_IF_NONE_MATCH=res["ETag"]
+            )
+
+        self.assertIn("Last-Modified", res)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified["ETag"], res["ETag"])
+        # The throttle bucket upsert and the validators aggregate
+        self.assertEqual(len(queries), 2)
+
+    def test_list_with_matching_last_modified_not_modified(self):
+        res = self.client.get(ASTRONOMY_SHOW_URL)
+
+        not_modified = self.client.get(
+            ASTRONOMY_SHOW_URL, HTTP_IF_MODIFIED_SINCE=res["Last-Modified"]
+        )
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_change_produces_new_etag(self):
+        res = self.client.get(detail_url(self.astronomy_show.id))
+
+        self.astronomy_show.show_themes.add(ShowTheme.objects.create(name="Cosmo"))
+        changed = self.client.get(
+            detail_url(self.astronomy_show.id), HTTP_IF_NONE_MATCH=res["ETag"]
+        )
+
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed["ETag"], res["ETag"])
+
+    def test_theme_delete_produces_new_etag(self):
+        show_theme = ShowTheme.objects.create(name="Cosmo")
+        self.astronomy_show.show_themes.add(show_theme)
+        res = self.client.get(detail_url(self.astronomy_show.id))
+
+        show_theme.delete()
+        changed = self.client.get(
+            detail_url(self.astronomy_show.id), HTTP_IF_NONE_MATCH=res["ETag"]
+        )
+
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(changed.data["show_themes"], [])
+
+    def test_etag_depends_on_filters(self):
+        res = self.client.get(ASTRONOMY_SHOW_URL)
+
+        filtered = self.client.get(
+            ASTRONOMY_SHOW_URL, {"title": "Sample"}, HTTP_IF_NONE_MATCH=res["ETag"]
+        )
+
+        self.assertEqual(filtered.status_code, status.HTTP_200_OK)
+
+
+def image_file(size=(1200, 900)):
+    image = Image.new("RGB", size, "navy")
+    exif = Image.Exif()
+    exif[0x010F] = "Camera maker"
+    output = BytesIO()
+    image.save(output, "JPEG", exif=exif)
+    return SimpleUploadedFile("poster.jpg", output.getvalue(), "image/jpeg")
+
+
+@LOCAL_CACHES
+@override_settings(IMAGE_VARIANTS={"ASYNC": False})
+class AstronomyShowImageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["catalog"].clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@test.com", "testpassword"
+        )
+        self.client.force_authenticate(self.admin)
+        self.astronomy_show = sample_astronomy_show()
+
+    def upload(self):
+        return self.client.post(
+            reverse(
+                "planetarium:astronomyshow-upload-image", args=[self.astronomy_show.id]
+            ),
+            {"image": image_file()},
+            format="multipart",
+        )
+
+    def test_upload_renders_variants_without_metadata(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        name = AstronomyShow.objects.get(id=self.astronomy_show.id).image.name
+        for variant, size in VARIANTS.items():
+            for image_format in FORMATS:
+                with default_storage.open(
+                    variant_name(name, variant, image_format)
+                ) as file:
+                    variant_image = Image.open(file)
+                    self.assertLessEqual(max(variant_image.size), size)
+                    self.assertFalse(variant_image.getexif())
+
+        listed = self.client.get(ASTRONOMY_SHOW_URL)
+        self.assertIn("/variants/", listed.data[0]["images"]["thumbnail"]["webp"])
+
+    def test_missing_variant_rendered_on_request(self):
+        self.upload()
+
+        listed = self.client.get(ASTRONOMY_SHOW_URL)
+        url = listed.data[0]["images"]["card"]["jpeg"]
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        name = AstronomyShow.objects.get(id=self.astronomy_show.id).image.name
+        self.assertTrue(default_storage.exists(variant_name(name, "card", "jpeg")))
+        self.assertFalse(
+            default_storage.exists(variant_name(name, "thumbnail", "jpeg"))
+        )
+
+    def test_finished_variants_replace_cached_render_urls(self):
+        self.upload()
+        lazy = self.client.get(ASTRONOMY_SHOW_URL)
+        self.assertIn("/images/", lazy.data[0]["images"]["card"]["webp"])
+
+        name = AstronomyShow.objects.get(id=self.astronomy_show.id).image.name
+        generate_variants(name)
+        listed = self.client.get(ASTRONOMY_SHOW_URL, HTTP_IF_NONE_MATCH=lazy["ETag"])
+
+        self.assertEqual(listed.status_code, status.HTTP_200_OK)
+        self.assertEqual(listed["X-Cache"], "MISS")
+        self.assertIn("/variants/", listed.data[0]["images"]["card"]["webp"])
+        detail = self.client.get(detail_url(self.astronomy_show.id))
+        self.assertIn("/variants/", detail.data["images"]["card"]["webp"])
+
+    def test_variant_rendering_throttled(self):
+        self.upload()
+        url = self.client.get(ASTRONOMY_SHOW_URL).data[0]["images"]["card"]["jpeg"]
+        rates = {**settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]}
+        rates["image_variant"] = "1/hour"
+
+        with mock.patch.object(ImageVariantRateThrottle, "THROTTLE_RATES", rates):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_302_FOUND)
+            res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_variant_rendering_requires_authentication(self):
+        self.upload()
+        url = self.client.get(ASTRONOMY_SHOW_URL).data[0]["images"]["card"]["jpeg"]
+        self.client.force_authenticate(None)
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        name = AstronomyShow.objects.get(id=self.astronomy_show.id).image.name
+        self.assertFalse(default_storage.exists(variant_name(name, "card", "jpeg")))
+
+
+@LOCAL_CACHES
+class ValuesListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["catalog"].clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "testuser@test.com",
+            "testpassword",
+        )
+        self.client.force_authenticate(self.user)
+        themes = [ShowTheme.objects.create(name=name) for name in ("Stars", "Moon")]
+        for index in range(3):
+            astronomy_show = sample_astronomy_show(
+                title=f"Show {index}", image=f"uploads/astronomy_show/{index}.jpg"
+            )
+            astronomy_show.show_themes.add(*themes[:index])
+            sample_show_session(
+                astronomy_show=astronomy_show,
+                show_time=f"2023-10-2{index} 14:00:00+00:00",
+            )
+
+    def assert_same_json(self, url, queryset, serializer_class):
+        res = self.client.get(url)
+
+        expected = serializer_class(
+            queryset, many=True, context={"request": res.wsgi_request}
+        ).data
+        self.assertEqual(res.content, JSONRenderer().render(expected))
+
+    def test_astronomy_show_list_matches_serializer(self):
+        self.assert_same_json(
+            ASTRONOMY_SHOW_URL,
+            AstronomyShow.objects.prefetch_related("show_themes"),
+            AstronomyShowListSerializer,
+        )
+
+    def test_row_serializer_reused_with_request_context(self):
+        with mock.patch(
+            "planetarium.fast_list.ValuesRowSerializer", wraps=ValuesRowSerializer
+        ) as row_serializer:
+            self.client.get(ASTRONOMY_SHOW_URL)
+            res = self.client.get(ASTRONOMY_SHOW_URL, secure=True)
+
+        self.assertLessEqual(row_serializer.call_count, 1)
+        self.assertTrue(res.data[0]["image"].startswith("https://testserver/"))
+
+    def test_show_session_list_matches_serializer(self):
+        self.assert_same_json(
+            SHOW_SESSION_URL,
+            ShowSession.objects.annotate(
+                tickets_available=F("planetarium_dome__rows")
+                * F("planetarium_dome__seats_in_row")
+                - F("tickets_sold")
+            ),
+            ShowSessionListSerializer,
+        )
@@ -0,0 +1,94 @@
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from planetarium import routers
+from planetarium.models import AstronomyShow, PlanetariumDome, ShowSession
+
+RESERVATION_URL = reverse("planetarium:reservation-list")
+SHOW_SESSION_URL = reverse("planetarium:showsession-list")
+REPLICA = next((alias for alias in settings.DATABASES if alias != "default"), None)
+
+
+@skipUnless(REPLICA, "needs a second database alias mirroring default")
+class ReadReplicaTests(TransactionTestCase):
+    databases = {"default", REPLICA} if REPLICA else {"default"}
+
+    def setUp(self):
+        self.settings = override_settings(
+            READ_REPLICAS={"ALIASES": [REPLICA], "PIN_CACHE": "default"}
+        )
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        routers._unhealthy_until.clear()
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "testuser@test.com", "testpassword"
+        )
+        self.client.force_authenticate(self.user)
+        self.show_session = ShowSession.objects.create(
+            show_time="2023-10-22 14:00:00+00:00",
+            astronomy_show=AstronomyShow.objects.create(
+                title="Sample title", description="Sample description"
+            ),
+            planetarium_dome=PlanetariumDome.objects.create(
+                name="TestDome", rows=5, seats_in_row=6
+            ),
+        )
+        # Creating the catalog rows pinned everyone to the primary
+        cache.clear()
+
+    def replica_queries(self, url):
+        with CaptureQueriesContext(connections[REPLICA]) as queries:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_list_reads_from_replica(self):
+        with CaptureQueriesContext(connections[REPLICA]) as queries:
+            res = self.client.get(SHOW_SESSION_URL)
+
+        self.assertEqual([item["id"] for item in res.data], [self.show_session.id])
+        self.assertGreater(len(queries), 0)
+
+    def test_writer_is_pinned_to_primary(self):
+        res = self.client.post(
+            RESERVATION_URL,
+            {"tickets": [{"row": 1, "seat": 1, "show_session": self.show_session.id}]},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self.replica_queries(SHOW_SESSION_URL), 0)
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("other@test.com", "testpassword")
+        )
+        self.assertGreater(self.replica_queries(SHOW_SESSION_URL), 0)
+
+    def test_catalog_change_pins_everyone(self):
+        AstronomyShow.objects.create(title="New", description="New")
+
+        self.assertEqual(self.replica_queries(SHOW_SESSION_URL), 0)
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        with CaptureQueriesContext(connections[REPLICA]) as queries:
+            with mock.patch.object(
+                connections[REPLICA], "ensure_connection", side_effect=OperationalError
+            ):
+                res = self.client.get(SHOW_SESSION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 0)
+
+        # Skipped until the retry delay has passed
+        self.assertEqual(self.replica_queries(SHOW_SESSION_URL), 0)
+        self.assertIn(REPLICA, routers._unhealthy_until)
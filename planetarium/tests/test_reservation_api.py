@@ -0,0 +1,349 @@
+import base64
+import json
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from planetarium.models import (
+    DailyOccupancy,
+    Reservation,
+    ShowSession,
+    Ticket,
+    TicketArchive,
+)
+from planetarium.tests.samples import sample_show_session
+
+RESERVATION_URL = reverse("planetarium:reservation-list")
+EXPORT_URL = reverse("planetarium:ticket-export")
+
+
+class ReservationApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "testuser@test.com",
+            "testpassword",
+        )
+        self.client.force_authenticate(self.user)
+        self.show_session = sample_show_session(rows=10, seats_in_row=12)
+
+    def reserve(self, *places):
+        payload = {
+            "tickets": [
+                {"row": row, "seat": seat, "show_session": self.show_session.id}
+                for row, seat in places
+            ]
+        }
+        return self.client.post(RESERVATION_URL, payload, format="json")
+
+    def test_create_reservation(self):
+        res = self.reserve((1, 1), (1, 2))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        reservation = Reservation.objects.get(id=res.data["id"])
+        self.assertEqual(reservation.user, self.user)
+        self.assertEqual(
+            list(reservation.tickets.values_list("row", "seat")), [(1, 1), (1, 2)]
+        )
+
+    def test_reservation_query_count_does_not_depend_on_ticket_count(self):
+        with CaptureQueriesContext(connection) as single_ticket:
+            self.reserve((1, 1))
+        with CaptureQueriesContext(connection) as many_tickets:
+            self.reserve(*[(2, seat) for seat in range(1, 11)])
+
+        self.assertEqual(Ticket.objects.count(), 11)
+        self.assertEqual(len(single_ticket), len(many_tickets))
+
+    def test_seat_out_of_range_rejected(self):
+        res = self.reserve((1, 1), (11, 1))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["tickets"][0], {})
+        self.assertIn("row", res.data["tickets"][1])
+        self.assertFalse(Ticket.objects.exists())
+
+    def test_taken_seat_rejected(self):
+        self.reserve((3, 4))
+
+        res = self.reserve((3, 5), (3, 4))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["tickets"][0], {})
+        self.assertEqual(res.data["tickets"][1]["non_field_errors"][0].code, "unique")
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_duplicate_seat_in_request_rejected(self):
+        res = self.reserve((5, 5), (5, 5))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("non_field_errors", res.data["tickets"][1])
+        self.assertFalse(Ticket.objects.exists())
+
+    def test_unknown_show_session_rejected(self):
+        res = self.client.post(
+            RESERVATION_URL,
+            {"tickets": [{"row": 1, "seat": 1, "show_session": 999}]},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("show_session", res.data["tickets"][0])
+
+
+class ReservationHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "testuser@test.com",
+            "testpassword",
+        )
+        self.client.force_authenticate(self.user)
+        show_session = sample_show_session(rows=10, seats_in_row=12)
+        for seat in range(1, 8):
+            reservation = Reservation.objects.create(user=self.user)
+            Ticket.objects.create(
+                reservation=reservation, show_session=show_session, row=1, seat=seat
+            )
+
+    def test_page_number_pagination_by_default(self):
+        res = self.client.get(RESERVATION_URL)
+
+        self.assertEqual(res.data["count"], 7)
+        self.assertEqual(len(res.data["results"]), 3)
+
+    def test_cursor_pagination_walks_all_reservations(self):
+        expected_ids = list(
+            Reservation.objects.order_by("-created_at", "-id").values_list(
+                "id", flat=True
+            )
+        )
+
+        listed_ids = []
+        queries_per_page = set()
+        url, params = RESERVATION_URL, {"pagination": "cursor"}
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", res.data)
+            listed_ids += [reservation["id"] for reservation in res.data["results"]]
+            queries_per_page.add(len(queries))
+            url, params = res.data["next"], None
+
+        self.assertEqual(listed_ids, expected_ids)
+        self.assertEqual(len(queries_per_page), 1)
+
+    def test_cursor_pagination_with_equal_created_at(self):
+        Reservation.objects.update(created_at=timezone.now())
+        expected_ids = list(
+            Reservation.objects.order_by("-id").values_list("id", flat=True)
+        )
+
+        pages = []
+        url, params = RESERVATION_URL, {"pagination": "cursor"}
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(url, params)
+            self.assertFalse(any("OFFSET" in query["sql"].upper() for query in queries))
+            pages.append([reservation["id"] for reservation in res.data["results"]])
+            url, params = res.data["next"], None
+        res = self.client.get(res.data["previous"])
+
+        self.assertEqual(sum(pages, []), expected_ids)
+        self.assertEqual(
+            [reservation["id"] for reservation in res.data["results"]], pages[-2]
+        )
+
+    def test_invalid_cursor_rejected(self):
+        res = self.client.get(
+            RESERVATION_URL, {"cursor": base64.b64encode(b"p=soon|1").decode()}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TicketExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@test.com", "testpassword"
+        )
+        self.client.force_authenticate(self.admin)
+        for day, seat in ((21, 1), (22, 2), (23, 3)):
+            show_session = sample_show_session(
+                show_time=f"2023-10-{day} 14:00:00+00:00"
+            )
+            reservation = Reservation.objects.create(user=self.admin)
+            Ticket.objects.create(
+                show_session=show_session, reservation=reservation, row=1, seat=seat
+            )
+
+    def test_export_csv_for_date_range(self):
+        res = self.client.get(EXPORT_URL, {"from": "2023-10-22", "to": "2023-10-23"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "text/csv")
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["ticket_id", "row", "seat"])
+        self.assertEqual([line.split(",")[2] for line in lines[1:]], ["2", "3"])
+        self.assertIn("admin@test.com", lines[1])
+
+    def test_export_ndjson(self):
+        res = self.client.get(EXPORT_URL, {"export_format": "ndjson"})
+
+        rows = [
+            json.loads(line)
+            for line in b"".join(res.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual([row["seat"] for row in rows], [1, 2, 3])
+        self.assertEqual(rows[0]["planetarium_dome"], "TestDome")
+
+    def test_export_admin_only(self):
+        user = get_user_model().objects.create_user("user@test.com", "password")
+        self.client.force_authenticate(user)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command("export_tickets", "--to=2023-10-21", stdout=out)
+
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+    def test_export_invalid_dates_rejected(self):
+        res = self.client.get(EXPORT_URL, {"from": "22.10.2023"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("from", res.data)
+
+        with self.assertRaisesMessage(CommandError, "--to: Date has wrong format"):
+            call_command("export_tickets", "--to=2023-13-01", stdout=StringIO())
+
+
+class ArchiveShowSessionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "testuser@test.com",
+            "testpassword",
+        )
+        self.client.force_authenticate(self.user)
+        self.past_session = sample_show_session(
+            rows=10, seats_in_row=12, show_time="2020-01-10 14:00:00+00:00"
+        )
+        self.recent_session = ShowSession.objects.create(
+            show_time=timezone.now(),
+            astronomy_show=self.past_session.astronomy_show,
+            planetarium_dome=self.past_session.planetarium_dome,
+        )
+        payload = {
+            "tickets": [
+                {"row": 1, "seat": 1, "show_session": self.past_session.id},
+                {"row": 1, "seat": 2, "show_session": self.past_session.id},
+                {"row": 2, "seat": 3, "show_session": self.recent_session.id},
+            ]
+        }
+        self.client.post(RESERVATION_URL, payload, format="json")
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command("archive_show_sessions", "--days=30", *args, stdout=out)
+        return out.getvalue()
+
+    def test_tickets_of_past_sessions_are_archived(self):
+        rollup = DailyOccupancy.objects.get(day=date(2020, 1, 10))
+
+        out = self.archive()
+
+        self.assertIn("Archived 2 tickets of 1 show sessions", out)
+        self.assertFalse(Ticket.objects.filter(show_session=self.past_session))
+        self.assertEqual(Ticket.objects.count(), 1)
+        archived = TicketArchive.objects.get()
+        self.assertEqual(archived.get_places(), [(1, 1), (1, 2)])
+
+        self.past_session.refresh_from_db()
+        self.assertIsNotNone(self.past_session.archived_at)
+        self.assertEqual(self.past_session.tickets_sold, 2)
+        self.assertTrue(self.past_session.get_seat_map().is_taken(1, 2))
+        self.assertEqual(
+            DailyOccupancy.objects.get(pk=rollup.pk).tickets_sold,
+            rollup.tickets_sold,
+        )
+
+    def test_reservation_history_lists_archived_tickets(self):
+        self.archive()
+
+        res = self.client.get(RESERVATION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        tickets = res.data["results"][0]["tickets"]
+        self.assertEqual(
+            sorted((t["show_session"], t["row"], t["seat"]) for t in tickets),
+            sorted(
+                [
+                    (self.past_session.id, 1, 1),
+                    (self.past_session.id, 1, 2),
+                    (self.recent_session.id, 2, 3),
+                ]
+            ),
+        )
+
+    def test_rerun_and_seat_counter_check_leave_archive_alone(self):
+        self.archive()
+
+        self.assertIn("Archived 0 tickets of 0 show sessions", self.archive())
+        out = StringIO()
+        call_command("sync_seat_counters", "--repair", stdout=out)
+        self.assertIn("0 drifted", out.getvalue())
+        self.past_session.refresh_from_db()
+        self.assertEqual(self.past_session.tickets_sold, 2)
+
+    def test_export_includes_archived_tickets(self):
+        admin = get_user_model().objects.create_superuser(
+            "admin@test.com", "testpassword"
+        )
+        self.client.force_authenticate(admin)
+        self.archive()
+
+        res = self.client.get(EXPORT_URL, {"export_format": "ndjson"})
+
+        rows = [
+            json.loads(line)
+            for line in b"".join(res.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual(
+            [(row["ticket_id"], row["row"], row["seat"]) for row in rows[:2]],
+            [(None, 1, 1), (None, 1, 2)],
+        )
+        self.assertEqual(rows[0]["user_email"], "testuser@test.com")
+        self.assertEqual(rows[2]["show_session_id"], self.recent_session.id)
+
+    def test_dry_run_only_counts(self):
+        self.assertIn("1 show sessions to archive", self.archive("--dry-run"))
+        self.assertFalse(TicketArchive.objects.exists())
+
+    def test_archived_session_cannot_be_booked(self):
+        self.archive()
+
+        payload = {
+            "tickets": [{"row": 5, "seat": 5, "show_session": self.past_session.id}]
+        }
+        res = self.client.post(RESERVATION_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
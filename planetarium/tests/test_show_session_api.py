@@ -0,0 +1,504 @@
+import base64
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from planetarium.models import (
+    DailyOccupancy,
+    PlanetariumDome,
+    Reservation,
+    SeatHold,
+    ShowSession,
+    Ticket,
+)
+from planetarium.seating import SeatMap
+from planetarium.tests.samples import sample_show_session
+
+RESERVATION_URL = reverse("planetarium:reservation-list")
+SHOW_SESSION_URL = reverse("planetarium:showsession-list")
+OCCUPANCY_URL = reverse("planetarium:occupancy-analytics")
+AVAILABILITY_URL = reverse("planetarium:showsession-availability")
+
+
+def detail_url(show_session_id: int):
+    return reverse("planetarium:showsession-detail", args=[show_session_id])
+
+
+def seat_map_url(show_session_id: int):
+    return reverse("planetarium:showsession-seat-map", args=[show_session_id])
+
+
+def best_seats_url(show_session_id: int):
+    return reverse("planetarium:showsession-best-seats", args=[show_session_id])
+
+
+class SeatMapTests(TestCase):
+    def test_seat_layout(self):
+        seat_map = SeatMap.from_places(2, 5, [(1, 1), (2, 5)])
+
+        self.assertEqual(seat_map.to_bytes(), bytes([0b10000000, 0b01000000]))
+        self.assertEqual(list(seat_map.taken_places()), [(1, 1), (2, 5)])
+        self.assertEqual(seat_map.count(), 2)
+
+    def test_release_seat(self):
+        seat_map = SeatMap.from_places(2, 5, [(1, 3), (2, 2)])
+
+        seat_map.release(1, 3)
+
+        self.assertFalse(seat_map.is_taken(1, 3))
+        self.assertTrue(seat_map.is_taken(2, 2))
+
+    def test_seat_out_of_range(self):
+        seat_map = SeatMap.empty(2, 5)
+
+        with self.assertRaises(IndexError):
+            seat_map.take(3, 1)
+
+    def test_find_block_prefers_center(self):
+        seat_map = SeatMap.from_places(5, 6, [(3, 3)])
+
+        self.assertEqual(seat_map.find_block(2), (3, 4))
+        self.assertEqual(seat_map.find_block(4), (2, 2))
+        self.assertEqual(seat_map.find_block(6), (2, 1))
+        self.assertIsNone(seat_map.find_block(7))
+
+
+class ShowSessionApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "testuser@test.com",
+            "testpassword",
+        )
+        self.client.force_authenticate(self.user)
+        self.show_session = sample_show_session(rows=5, seats_in_row=6)
+
+    def reserve(self, *places):
+        payload = {
+            "tickets": [
+                {"row": row, "seat": seat, "show_session": self.show_session.id}
+                for row, seat in places
+            ]
+        }
+        return self.client.post(RESERVATION_URL, payload, format="json")
+
+    def test_seat_map_tracks_reservations(self):
+        self.reserve((1, 2), (5, 6))
+
+        res = self.client.get(seat_map_url(self.show_session.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["rows"], 5)
+        self.assertEqual(res.data["seats_in_row"], 6)
+        seat_map = SeatMap(5, 6, base64.b64decode(res.data["seat_map"]))
+        self.assertEqual(list(seat_map.taken_places()), [(1, 2), (5, 6)])
+
+    def test_detail_lists_taken_places(self):
+        self.reserve((3, 1), (2, 4))
+
+        res = self.client.get(detail_url(self.show_session.id))
+
+        self.assertEqual(
+            res.data["taken_places"],
+            [{"row": 2, "seat": 4}, {"row": 3, "seat": 1}],
+        )
+
+    def test_ticket_delete_releases_seat(self):
+        self.reserve((1, 1), (1, 2))
+
+        Ticket.objects.get(row=1, seat=1).delete()
+
+        self.show_session.refresh_from_db()
+        self.assertEqual(
+            list(self.show_session.get_seat_map().taken_places()), [(1, 2)]
+        )
+
+    def test_reservation_delete_releases_seats(self):
+        self.reserve((4, 4), (4, 5))
+
+        Reservation.objects.all().delete()
+
+        self.show_session.refresh_from_db()
+        self.assertEqual(self.show_session.get_seat_map().count(), 0)
+
+    def test_dome_geometry_change_rebuilds_seat_map(self):
+        self.reserve((2, 1), (5, 6))
+        dome = self.show_session.planetarium_dome
+
+        # 5x5 seats need as many bytes as 5x6
+        dome.seats_in_row = 5
+        dome.save()
+
+        self.show_session.refresh_from_db()
+        seat_map = self.show_session.get_seat_map()
+        self.assertEqual(list(seat_map.taken_places()), [(2, 1)])
+        self.assertEqual(self.show_session.tickets_sold, 1)
+
+    def test_move_to_other_dome_rebuilds_seat_map(self):
+        self.reserve((2, 1), (5, 6))
+        # 5x5 seats need as many bytes as 5x6
+        dome = PlanetariumDome.objects.create(name="Small", rows=5, seats_in_row=5)
+
+        show_session = ShowSession.objects.get(pk=self.show_session.pk)
+        show_session.planetarium_dome = dome
+        show_session.save()
+
+        show_session.refresh_from_db()
+        seat_map = show_session.get_seat_map()
+        self.assertEqual(list(seat_map.taken_places()), [(2, 1)])
+        self.assertEqual(show_session.tickets_sold, 1)
+        self.assertEqual(
+            list(
+                DailyOccupancy.objects.values_list(
+                    "planetarium_dome", "capacity", "tickets_sold"
+                )
+            ),
+            [(dome.id, 25, 1)],
+        )
+
+    def test_reservation_changes_list_etag(self):
+        res = self.client.get(SHOW_SESSION_URL)
+
+        self.reserve((1, 1))
+        changed = self.client.get(SHOW_SESSION_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(changed.data[0]["tickets_available"], 29)
+
+    def test_list_reads_tickets_available_from_counter(self):
+        self.reserve((1, 1), (1, 2), (2, 2))
+        Ticket.objects.get(row=2, seat=2).delete()
+
+        res = self.client.get(SHOW_SESSION_URL)
+
+        self.show_session.refresh_from_db()
+        self.assertEqual(self.show_session.tickets_sold, 2)
+        self.assertEqual(res.data[0]["tickets_available"], 28)
+
+    def test_sync_seat_counters_repairs_drift(self):
+        self.reserve((1, 1), (2, 2))
+        ShowSession.objects.update(tickets_sold=7, occupancy=b"")
+
+        out = StringIO()
+        call_command("sync_seat_counters", "--repair", stdout=out)
+
+        self.assertIn("1 drifted", out.getvalue())
+        self.show_session.refresh_from_db()
+        self.assertEqual(self.show_session.tickets_sold, 2)
+        self.assertEqual(
+            list(self.show_session.get_seat_map().taken_places()), [(1, 1), (2, 2)]
+        )
+
+    def test_generated_data_has_consistent_seat_counters(self):
+        call_command(
+            "generate_data",
+            "--themes=2",
+            "--domes=2",
+            "--shows=3",
+            "--sessions=5",
+            "--users=4",
+            stdout=StringIO(),
+        )
+
+        out = StringIO()
+        call_command("sync_seat_counters", stdout=out)
+
+        self.assertIn("0 drifted", out.getvalue())
+        self.assertEqual(ShowSession.objects.count(), 6)
+
+
+class ShowSessionDateFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "testuser@test.com",
+            "testpassword",
+        )
+        self.client.force_authenticate(self.user)
+        self.early = sample_show_session(show_time="2023-10-22 00:00:00+00:00")
+        self.late = sample_show_session(show_time="2023-10-22 23:59:59+00:00")
+        self.next_day = sample_show_session(show_time="2023-10-23 00:00:00+00:00")
+        self.later = sample_show_session(show_time="2023-10-25 12:00:00+00:00")
+
+    def listed_ids(self, params):
+        res = self.client.get(SHOW_SESSION_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return {show_session["id"] for show_session in res.data}
+
+    def test_filter_by_date(self):
+        self.assertEqual(
+            self.listed_ids({"date": "2023-10-22"}), {self.early.id, self.late.id}
+        )
+
+    def test_filter_by_date_range(self):
+        self.assertEqual(
+            self.listed_ids({"from": "2023-10-22", "to": "2023-10-23"}),
+            {self.early.id, self.late.id, self.next_day.id},
+        )
+        self.assertEqual(self.listed_ids({"from": "2023-10-24"}), {self.later.id})
+
+    def test_list_ordered_by_show_time_newest_first(self):
+        res = self.client.get(SHOW_SESSION_URL)
+
+        self.assertEqual(
+            [show_session["id"] for show_session in res.data],
+            [self.later.id, self.next_day.id, self.late.id, self.early.id],
+        )
+
+    def test_invalid_date_rejected(self):
+        res = self.client.get(SHOW_SESSION_URL, {"date": "22.10.2023"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OccupancyAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@test.com", "testpassword"
+        )
+        self.client.force_authenticate(self.admin)
+        self.show_session = sample_show_session(rows=5, seats_in_row=6)
+        self.other_session = ShowSession.objects.create(
+            show_time="2023-10-23 14:00:00+00:00",
+            astronomy_show=self.show_session.astronomy_show,
+            planetarium_dome=self.show_session.planetarium_dome,
+        )
+
+    def reserve(self, show_session, *places):
+        payload = {
+            "tickets": [
+                {"row": row, "seat": seat, "show_session": show_session.id}
+                for row, seat in places
+            ]
+        }
+        return self.client.post(RESERVATION_URL, payload, format="json")
+
+    def rollups(self):
+        return list(
+            DailyOccupancy.objects.order_by("day").values_list(
+                "day", "sessions", "capacity", "tickets_sold"
+            )
+        )
+
+    def test_rollups_follow_bookings_and_session_changes(self):
+        self.reserve(self.show_session, (1, 1), (1, 2), (1, 3))
+        self.reserve(self.other_session, (2, 2))
+        Ticket.objects.get(show_session=self.show_session, seat=3).delete()
+        self.other_session.show_time = "2023-10-22 18:00:00+00:00"
+        self.other_session.save()
+        incremental = self.rollups()
+
+        call_command("rebuild_occupancy_rollups", stdout=StringIO())
+
+        self.assertEqual(incremental, [(date(2023, 10, 22), 2, 60, 3)])
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_session_delete_removes_its_share(self):
+        self.reserve(self.other_session, (2, 2))
+
+        self.other_session.delete()
+
+        self.assertEqual(self.rollups(), [(date(2023, 10, 22), 1, 30, 0)])
+
+    def test_session_delete_subtracts_its_tickets_once(self):
+        self.other_session.show_time = "2023-10-22 18:00:00+00:00"
+        self.other_session.save()
+        self.reserve(self.show_session, (1, 1), (1, 2))
+        self.reserve(self.other_session, (2, 2))
+
+        # No queries per cascaded ticket
+        with self.assertNumQueries(10):
+            ShowSession.objects.get(pk=self.show_session.pk).delete()
+
+        self.assertEqual(self.rollups(), [(date(2023, 10, 22), 1, 30, 1)])
+        self.assertEqual(
+            ShowSession.objects.get(pk=self.other_session.pk).get_seat_map().count(),
+            1,
+        )
+
+    def test_report_grouped_by_day(self):
+        self.reserve(self.show_session, (1, 1), (1, 2), (1, 3))
+
+        res = self.client.get(
+            OCCUPANCY_URL, {"group_by": "astronomy_show,day", "to": "2023-10-22"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]["astronomy_show__title"], "Sample title")
+        self.assertEqual(res.data[0]["tickets_sold"], 3)
+        self.assertAlmostEqual(res.data[0]["fill_rate"], 0.1)
+
+    def test_unknown_group_rejected(self):
+        res = self.client.get(OCCUPANCY_URL, {"group_by": "user"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BestSeatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "testuser@test.com", "testpassword"
+        )
+        self.other = get_user_model().objects.create_user(
+            "other@test.com", "testpassword"
+        )
+        self.client.force_authenticate(self.user)
+        self.show_session = sample_show_session(rows=5, seats_in_row=6)
+        self.url = best_seats_url(self.show_session.id)
+
+    def reserve(self, *places):
+        payload = {
+            "tickets": [
+                {"row": row, "seat": seat, "show_session": self.show_session.id}
+                for row, seat in places
+            ]
+        }
+        return self.client.post(RESERVATION_URL, payload, format="json")
+
+    def test_finds_center_block_around_sold_seats(self):
+        self.reserve((3, 3))
+
+        res = self.client.get(self.url, {"count": 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["row"], 3)
+        self.assertEqual(res.data["seats"], [4, 5])
+        self.assertIsNone(res.data["held_until"])
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_invalid_count_rejected(self):
+        for count in ("0", "7", "two"):
+            res = self.client.get(self.url, {"count": count})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_hold_blocks_other_users(self):
+        res = self.client.post(f"{self.url}?count=6")
+        self.assertEqual((res.data["row"], res.data["seats"][0]), (3, 1))
+        self.assertIsNotNone(res.data["held_until"])
+
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(self.url, {"count": 6}).data["row"], 2)
+        res = self.reserve((3, 2))
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            res.data["seats"],
+            [{"show_session": self.show_session.id, "row": 3, "seat": 2}],
+        )
+
+    def test_booking_releases_own_hold(self):
+        self.client.post(f"{self.url}?count=2")
+
+        res = self.reserve((3, 3), (3, 4))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_expired_hold_is_ignored(self):
+        self.client.post(f"{self.url}?count=2")
+        SeatHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.client.force_authenticate(self.other)
+        res = self.client.post(f"{self.url}?count=2")
+
+        self.assertEqual(res.data["seats"], [3, 4])
+        self.assertEqual(
+            set(SeatHold.objects.values_list("user", flat=True)), {self.other.id}
+        )
+
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "testuser@test.com", "testpassword"
+        )
+        self.client.force_authenticate(self.user)
+        self.first = sample_show_session(
+            rows=5, seats_in_row=6, show_time="2023-10-22 14:00:00+00:00"
+        )
+        self.second = sample_show_session(
+            rows=5, seats_in_row=6, show_time="2023-10-23 14:00:00+00:00"
+        )
+        self.other = sample_show_session(
+            rows=5, seats_in_row=6, show_time="2023-11-30 14:00:00+00:00"
+        )
+        self.client.post(
+            RESERVATION_URL,
+            {
+                "tickets": [
+                    {"row": 1, "seat": seat, "show_session": self.first.id}
+                    for seat in (1, 2)
+                ]
+            },
+            format="json",
+        )
+
+    def test_sessions_by_ids_with_seat_maps(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                AVAILABILITY_URL,
+                {"ids": f"{self.first.id},{self.second.id}", "seat_map": "true"},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item["id"], item["tickets_available"]) for item in res.data],
+            [(self.first.id, 28), (self.second.id, 30)],
+        )
+        self.assertEqual(
+            base64.b64decode(res.data[0]["seat_map"]),
+            SeatMap.from_places(5, 6, [(1, 1), (1, 2)]).to_bytes(),
+        )
+        # The throttle bucket upsert and the session query
+        self.assertEqual(len(queries), 2)
+
+    def test_sessions_by_date_range(self):
+        res = self.client.get(
+            AVAILABILITY_URL, {"from": "2023-10-22", "to": "2023-10-23"}
+        )
+
+        self.assertEqual(
+            [item["id"] for item in res.data], [self.first.id, self.second.id]
+        )
+        self.assertNotIn("seat_map", res.data[0])
+
+    def test_stale_seat_map_is_rebuilt(self):
+        ShowSession.objects.filter(id=self.first.id).update(occupancy=b"")
+
+        res = self.client.get(
+            AVAILABILITY_URL, {"ids": str(self.first.id), "seat_map": "1"}
+        )
+
+        self.assertEqual(
+            base64.b64decode(res.data[0]["seat_map"]),
+            SeatMap.from_places(5, 6, [(1, 1), (1, 2)]).to_bytes(),
+        )
+
+    def test_unbounded_requests_rejected(self):
+        for params in (
+            {},
+            {"from": "2023-10-01"},
+            {"from": "2023-10-01", "to": "2023-12-01"},
+            {"ids": "1,x"},
+        ):
+            res = self.client.get(AVAILABILITY_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, params)
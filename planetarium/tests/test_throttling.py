@@ -0,0 +1,57 @@
+import time
+from functools import partial
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from planetarium.models import ThrottleBucket
+from planetarium.throttling import SharedUserRateThrottle
+
+SHOW_THEME_URL = reverse("planetarium:showtheme-list")
+
+
+class SharedThrottleTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpassword"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_bucket_refills_at_rate(self):
+        take = partial(ThrottleBucket.take, "key", 2, 0.5)
+
+        self.assertEqual(take(now=100), (True, 1))
+        self.assertEqual(take(now=100), (True, 0))
+        self.assertEqual(take(now=101), (False, 0.5))
+        self.assertEqual(take(now=102), (True, 0))
+        self.assertEqual(ThrottleBucket.objects.count(), 1)
+
+    def test_limit_is_shared_and_returns_retry_after(self):
+        rates = {"user": "2/min", "anon": "2/min"}
+        with mock.patch.object(SharedUserRateThrottle, "THROTTLE_RATES", rates):
+            responses = [self.client.get(SHOW_THEME_URL) for _ in range(3)]
+
+        self.assertEqual(
+            [res.status_code for res in responses],
+            [status.HTTP_200_OK, status.HTTP_200_OK, status.HTTP_429_TOO_MANY_REQUESTS],
+        )
+        self.assertLessEqual(int(responses[-1]["Retry-After"]), 30)
+        bucket = ThrottleBucket.objects.get(key=f"throttle_user_{self.user.pk}")
+        self.assertFalse(bucket.allowed)
+
+    def test_purge_keeps_recent_buckets(self):
+        ThrottleBucket.objects.create(key="old", tokens=0, checked_at=0)
+        ThrottleBucket.objects.create(key="new", tokens=0, checked_at=time.time())
+
+        call_command("purge_throttle_buckets", stdout=StringIO())
+
+        self.assertEqual(
+            list(ThrottleBucket.objects.values_list("key", flat=True)), ["new"]
+        )
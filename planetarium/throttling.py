@@ -0,0 +1,44 @@
+from rest_framework import throttling
+
+from planetarium.models import ThrottleBucket
+
+
+class BucketThrottleMixin:
+    """Keeps throttle state in ThrottleBucket rows instead of the cache.
+
+    The per-process cache multiplies limits by the number of workers and
+    stores a timestamp per request. A token bucket holds the rate's request
+    count as a burst and refills at the same average rate, in one row per
+    key checked with one query.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.allowed, self.tokens = ThrottleBucket.take(
+            self.key, self.num_requests, self.num_requests / self.duration
+        )
+        return self.allowed
+
+    def wait(self):
+        """Seconds until the next token"""
+        if not self.num_requests:
+            return None
+        return max(0.0, 1 - self.tokens) * self.duration / self.num_requests
+
+
+class SharedAnonRateThrottle(BucketThrottleMixin, throttling.AnonRateThrottle):
+    pass
+
+
+class SharedUserRateThrottle(BucketThrottleMixin, throttling.UserRateThrottle):
+    pass
+
+
+class ImageVariantRateThrottle(BucketThrottleMixin, throttling.UserRateThrottle):
+    scope = "image_variant"
@@ -7,6 +7,9 @@ from planetarium.views import (
     ReservationViewSet,
     PlanetariumDomeViewSet,
     ShowSessionViewSet,
+    TicketExportView,
+    OccupancyAnalyticsView,
+    AstronomyShowImageVariantView,
 )
 
 router = routers.DefaultRouter()
@@ -18,6 +21,19 @@ router.register("astronomy_shows", AstronomyShowViewSet)
 router.register("show_sessions", ShowSessionViewSet)
 
 
-urlpatterns = [path("", include(router.urls))]
+urlpatterns = [
+    path("", include(router.urls)),
+    path(
+        "astronomy_shows/<int:pk>/images/<str:variant>.<str:image_format>",
+        AstronomyShowImageVariantView.as_view(),
+        name="astronomyshow-image-variant",
+    ),
+    path("exports/tickets/", TicketExportView.as_view(), name="ticket-export"),
+    path(
+        "analytics/occupancy/",
+        OccupancyAnalyticsView.as_view(),
+        name="occupancy-analytics",
+    ),
+]
 
 app_name = "planetarium"
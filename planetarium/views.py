@@ -1,15 +1,29 @@
-from datetime import datetime
+from datetime import timedelta
+from functools import partial
 
-from django.db.models import F, Count
-from drf_spectacular.types import OpenApiTypes
-from drf_spectacular.utils import extend_schema, OpenApiParameter
+from django.db.models import Exists, F, OuterRef
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponseRedirect, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 
+from planetarium.analytics import GROUPS, occupancy_report
+from planetarium.availability import MAX_DAYS, MAX_SESSIONS, session_availability
+from planetarium.booking import find_best_seats, hold_best_seats
+from planetarium.cache import CachedResponseMixin
+from planetarium.conditional import ConditionalGetMixin
+from planetarium.dates import parse_day, show_time_range, start_of_day
+from planetarium.fast_list import ValuesListMixin
+from planetarium.exports import CONTENT_TYPES, WRITERS, ticket_rows
+from planetarium.images import FORMATS, VARIANTS, generate_variant, schedule_variants
+from planetarium.instrumentation import TimedViewMixin
 from planetarium.models import (
     ShowTheme,
     AstronomyShow,
@@ -17,7 +31,10 @@ from planetarium.models import (
     Reservation,
     ShowSession,
 )
+from planetarium.openapi import OpenApiParameter, OpenApiTypes, extend_schema
+from planetarium.pagination import KeysetCursorPagination
 from planetarium.permissions import IsAdminOrIfAuthenticatedReadOnly
+from planetarium.routers import ReplicaReadMixin, pin_to_primary
 from planetarium.serializers import (
     ShowThemeSerializer,
     AstronomyShowSerializer,
@@ -26,12 +43,21 @@ from planetarium.serializers import (
     ShowSessionSerializer,
     AstronomyShowListSerializer,
     AstronomyShowDetailSerializer,
+    AstronomyShowImageSerializer,
     ShowSessionListSerializer,
-    ReservationListSerializer, ShowSessionDetailSerializer,
+    ReservationListSerializer,
+    ShowSessionDetailSerializer,
+    ShowSessionSeatMapSerializer,
+    BestSeatsSerializer,
+    ShowSessionAvailabilitySerializer,
 )
+from planetarium.throttling import ImageVariantRateThrottle
 
 
 class ShowThemeViewSet(
+    TimedViewMixin,
+    ReplicaReadMixin,
+    CachedResponseMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     GenericViewSet,
@@ -39,9 +65,15 @@ class ShowThemeViewSet(
     serializer_class = ShowThemeSerializer
     queryset = ShowTheme.objects.all()
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    cache_models = (ShowTheme,)
 
 
 class AstronomyShowViewSet(
+    TimedViewMixin,
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    CachedResponseMixin,
+    ValuesListMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
     mixins.RetrieveModelMixin,
@@ -50,6 +82,7 @@ class AstronomyShowViewSet(
     serializer_class = AstronomyShowSerializer
     queryset = AstronomyShow.objects.all()
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    cache_models = (AstronomyShow, ShowTheme)
 
     @staticmethod
     def _params_to_ints(qs):
@@ -59,22 +92,34 @@ class AstronomyShowViewSet(
     def get_queryset(self):
         show_themes = self.request.query_params.get("themes")
         title = self.request.query_params.get("title")
-        queryset = self.queryset
+        queryset = self.queryset.all()
 
         if show_themes:
             show_themes_id = self._params_to_ints(show_themes)
-            queryset = queryset.filter(show_themes__id__in=show_themes_id)
+            queryset = queryset.filter(
+                Exists(
+                    AstronomyShow.show_themes.through.objects.filter(
+                        astronomyshow_id=OuterRef("pk"),
+                        showtheme_id__in=show_themes_id,
+                    )
+                )
+            )
 
         if title:
             queryset = queryset.filter(title__icontains=title)
 
-        return queryset.distinct()
+        if self.action in ("list", "retrieve"):
+            queryset = queryset.prefetch_related("show_themes")
+
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "list":
             return AstronomyShowListSerializer
         if self.action == "retrieve":
             return AstronomyShowDetailSerializer
+        if self.action == "upload_image":
+            return AstronomyShowImageSerializer
 
         return AstronomyShowSerializer
 
@@ -89,7 +134,10 @@ class AstronomyShowViewSet(
         serializer = self.get_serializer(astronomy_show, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(images_ready=False)
+            # Resized variants are rendered by the worker pool after the response
+            if astronomy_show.image:
+                schedule_variants(astronomy_show.image.name)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -112,8 +160,20 @@ class AstronomyShowViewSet(
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            partial(self.get_cached_response, super().retrieve),
+            request,
+            *args,
+            **kwargs,
+        )
+
 
 class ShowSessionViewSet(
+    TimedViewMixin,
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    ValuesListMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
     mixins.RetrieveModelMixin,
@@ -126,28 +186,61 @@ class ShowSessionViewSet(
         .annotate(
             tickets_available=(
                 F("planetarium_dome__rows") * F("planetarium_dome__seats_in_row")
-                - Count("tickets")
+                - F("tickets_sold")
             )
         )
     )
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    values_expressions = {
+        "planetarium_dome.capacity": (
+            F("planetarium_dome__rows") * F("planetarium_dome__seats_in_row")
+        )
+    }
+    conditional_timestamps = (
+        "updated_at",
+        "astronomy_show__updated_at",
+        "planetarium_dome__updated_at",
+    )
 
     def get_serializer_class(self):
         if self.action == "list":
             return ShowSessionListSerializer
         if self.action == "retrieve":
             return ShowSessionDetailSerializer
+        if self.action == "seat_map":
+            return ShowSessionSeatMapSerializer
+        if self.action == "best_seats":
+            return BestSeatsSerializer
+        if self.action == "availability":
+            return ShowSessionAvailabilitySerializer
         return ShowSessionSerializer
 
+    def get_permissions(self):
+        if self.action == "best_seats":
+            # Any user may hold seats, like any user may book them
+            return [IsAuthenticated()]
+        return super().get_permissions()
+
     def get_queryset(self):
         date = self.request.query_params.get("date")
         astronomy_show_id_str = self.request.query_params.get("astronomy_show")
 
-        queryset = self.queryset
+        queryset = self.queryset.all()
 
+        # Days are filtered as half-open show_time ranges rather than with
+        # show_time__date, so the show_time indexes stay usable
         if date:
-            date = datetime.strptime(date, "%Y-%m-%d").date()
-            queryset = queryset.filter(show_time__date=date)
+            day = parse_day(date, "date")
+            queryset = queryset.filter(
+                show_time__gte=start_of_day(day),
+                show_time__lt=start_of_day(day + timedelta(days=1)),
+            )
+
+        show_time_from, show_time_to = show_time_range(self.request.query_params)
+        if show_time_from:
+            queryset = queryset.filter(show_time__gte=show_time_from)
+        if show_time_to:
+            queryset = queryset.filter(show_time__lt=show_time_to)
 
         if astronomy_show_id_str:
             queryset = queryset.filter(astronomy_show_id=int(astronomy_show_id_str))
@@ -168,13 +261,157 @@ class ShowSessionViewSet(
                     "Filter by datetime of ShowSession " "(ex. ?date=2022-10-23)"
                 ),
             ),
+            OpenApiParameter(
+                "from",
+                type=OpenApiTypes.DATE,
+                description=(
+                    "Filter show sessions starting on or after the date "
+                    "(ex. ?from=2022-10-23)"
+                ),
+            ),
+            OpenApiParameter(
+                "to",
+                type=OpenApiTypes.DATE,
+                description=(
+                    "Filter show sessions starting on or before the date "
+                    "(ex. ?to=2022-10-30)"
+                ),
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(super().retrieve, request, *args, **kwargs)
+
+    @action(methods=["GET"], detail=True, url_path="seat_map")
+    def seat_map(self, request, pk=None):
+        """Seat occupancy packed one bit per seat, row by row"""
+
+        def get_seat_map(request, pk=None):
+            serializer = self.get_serializer(self.get_object())
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        return self.get_conditional_response(get_seat_map, request, pk=pk)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "ids",
+                type=OpenApiTypes.STR,
+                description=f"Comma separated show session ids, at most "
+                f"{MAX_SESSIONS} (ex. ?ids=1,2,3)",
+            ),
+            OpenApiParameter(
+                "date",
+                type=OpenApiTypes.DATE,
+                description="Sessions of a day (ex. ?date=2022-10-23)",
+            ),
+            OpenApiParameter(
+                "from",
+                type=OpenApiTypes.DATE,
+                description=f"First day of a range of at most {MAX_DAYS} days, "
+                f"used with to (ex. ?from=2022-10-23)",
+            ),
+            OpenApiParameter(
+                "to",
+                type=OpenApiTypes.DATE,
+                description="Last day of the range (ex. ?to=2022-10-30)",
+            ),
+            OpenApiParameter(
+                "seat_map",
+                type=OpenApiTypes.BOOL,
+                description="Add the base64 seat map of every session",
+            ),
+        ],
+        responses=ShowSessionAvailabilitySerializer(many=True),
+    )
+    @action(methods=["GET"], detail=False, url_path="availability")
+    def availability(self, request):
+        """Remaining seats of many show sessions from one query.
+
+        Takes session ids, a day or a date range; the astronomy_show filter
+        of the list applies as well.
+        """
+        params = request.query_params
+        queryset = self.get_queryset()
+        if params.get("ids"):
+            try:
+                ids = {int(value) for value in params["ids"].split(",")}
+            except ValueError:
+                raise ValidationError({"ids": "Use comma separated numbers."})
+            if len(ids) > MAX_SESSIONS:
+                raise ValidationError(
+                    {"ids": f"At most {MAX_SESSIONS} sessions at a time."}
+                )
+            queryset = queryset.filter(id__in=ids)
+        elif params.get("from") and params.get("to"):
+            days = (
+                parse_day(params["to"], "to") - parse_day(params["from"], "from")
+            ).days
+            if days >= MAX_DAYS:
+                raise ValidationError({"to": f"At most {MAX_DAYS} days at a time."})
+        elif not params.get("date"):
+            raise ValidationError(
+                {"detail": "Pass ids, a date or a from and to date range."}
+            )
+
+        seat_maps = params.get("seat_map", "").lower() in ("1", "true")
+        serializer = self.get_serializer(
+            session_availability(queryset, seat_maps), many=True
+        )
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "count",
+                type=OpenApiTypes.INT,
+                required=True,
+                description="Number of adjacent seats (ex. ?count=4)",
+            ),
+        ],
+        request=None,
+    )
+    @action(methods=["GET", "POST"], detail=True, url_path="best_seats")
+    def best_seats(self, request, pk=None):
+        """Best block of adjacent free seats, closest to the dome center.
+
+        POST also holds the block for the user for a few minutes; nobody
+        else can book or hold those seats until it expires.
+        """
+        show_session = self.get_object()
+        seats_in_row = show_session.planetarium_dome.seats_in_row
+        try:
+            count = int(request.query_params.get("count", ""))
+        except ValueError:
+            count = 0
+        if not 1 <= count <= seats_in_row:
+            raise ValidationError(
+                {"count": f"Must be a number of seats from 1 to {seats_in_row}."}
+            )
+
+        if request.method == "POST":
+            places, held_until = hold_best_seats(show_session.id, count, request.user)
+        else:
+            places, held_until = find_best_seats(show_session, count), None
+        serializer = self.get_serializer(
+            {
+                "show_session": show_session.id,
+                "row": places[0][0] if places else None,
+                "seats": [seat for _, seat in places],
+                "held_until": held_until,
+            }
+        )
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 
 class PlanetariumDomeViewSet(
+    TimedViewMixin,
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    CachedResponseMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     GenericViewSet,
@@ -182,6 +419,7 @@ class PlanetariumDomeViewSet(
     serializer_class = PlanetariumDomeSerializer
     queryset = PlanetariumDome.objects.all()
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    cache_models = (PlanetariumDome,)
 
 
 class OrderPagination(PageNumberPagination):
@@ -189,21 +427,180 @@ class OrderPagination(PageNumberPagination):
     max_page_size = 100
 
 
+class OrderCursorPagination(KeysetCursorPagination):
+    page_size = 3
+    ordering = ("-created_at", "-id")
+
+
 class ReservationViewSet(
-    mixins.ListModelMixin, mixins.CreateModelMixin, GenericViewSet
+    TimedViewMixin, mixins.ListModelMixin, mixins.CreateModelMixin, GenericViewSet
 ):
     serializer_class = ReservationSerializer
     pagination_class = OrderPagination
+    cursor_pagination_class = OrderCursorPagination
     queryset = Reservation.objects.all()
     permission_classes = (IsAuthenticated,)
 
+    @property
+    def paginator(self):
+        """Switches to cursor pagination with ?pagination=cursor"""
+        if not hasattr(self, "_paginator"):
+            request = getattr(self, "request", None)
+            if request is not None and (
+                request.query_params.get("pagination") == "cursor"
+                or "cursor" in request.query_params
+            ):
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_queryset(self):
-        return Reservation.objects.filter(user=self.request.user)
+        queryset = Reservation.objects.filter(user=self.request.user)
+
+        if self.action == "list":
+            queryset = queryset.prefetch_related("tickets", "archived_tickets")
+
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "list":
             return ReservationListSerializer
         return ReservationSerializer
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "pagination",
+                type=OpenApiTypes.STR,
+                enum=["page", "cursor"],
+                description=(
+                    "Use cursor pagination instead of page numbers "
+                    "(ex. ?pagination=cursor)"
+                ),
+            ),
+            OpenApiParameter(
+                "cursor",
+                type=OpenApiTypes.STR,
+                description="Cursor from the next/previous link of a cursor page",
+            ),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+        # The user's next reads of their seats must not hit a lagging replica
+        pin_to_primary(self.request.user)
+
+
+class TicketExportView(TimedViewMixin, APIView):
+    """Streams every ticket of a show time range as CSV or NDJSON"""
+
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "from",
+                type=OpenApiTypes.DATE,
+                description="Sessions from this day on (ex. ?from=2023-10-01)",
+            ),
+            OpenApiParameter(
+                "to",
+                type=OpenApiTypes.DATE,
+                description="Sessions up to this day included (ex. ?to=2023-10-31)",
+            ),
+            OpenApiParameter(
+                "export_format",
+                type=OpenApiTypes.STR,
+                enum=list(WRITERS),
+                description="csv (default) or ndjson",
+            ),
+        ],
+        responses={(200, "text/csv"): OpenApiTypes.STR},
+    )
+    def get(self, request):
+        export_format = request.query_params.get("export_format", "csv")
+        if export_format not in WRITERS:
+            raise ValidationError(
+                {"export_format": f"Choose one of: {', '.join(WRITERS)}."}
+            )
+
+        show_time_from, show_time_to = show_time_range(request.query_params)
+        response = StreamingHttpResponse(
+            WRITERS[export_format](ticket_rows(show_time_from, show_time_to)),
+            content_type=CONTENT_TYPES[export_format],
+        )
+        response[
+            "Content-Disposition"
+        ] = f'attachment; filename="tickets.{export_format}"'
+        return response
+
+
+class OccupancyAnalyticsView(TimedViewMixin, APIView):
+    """Sold seats and fill rate per show, dome and/or day from the rollups"""
+
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "from",
+                type=OpenApiTypes.DATE,
+                description="First day included (ex. ?from=2023-10-01)",
+            ),
+            OpenApiParameter(
+                "to",
+                type=OpenApiTypes.DATE,
+                description="Last day included (ex. ?to=2023-10-31)",
+            ),
+            OpenApiParameter(
+                "group_by",
+                type=OpenApiTypes.STR,
+                description=(
+                    "Comma separated groups out of "
+                    f"{', '.join(GROUPS)} (ex. ?group_by=astronomy_show,day)"
+                ),
+            ),
+        ],
+        responses=OpenApiTypes.OBJECT,
+    )
+    def get(self, request):
+        group_by = request.query_params.get("group_by", "astronomy_show").split(",")
+        unknown = set(group_by) - set(GROUPS)
+        if unknown:
+            raise ValidationError(
+                {"group_by": f"Unknown groups: {', '.join(sorted(unknown))}."}
+            )
+
+        day_from = day_to = None
+        if request.query_params.get("from"):
+            day_from = parse_day(request.query_params["from"], "from")
+        if request.query_params.get("to"):
+            day_to = parse_day(request.query_params["to"], "to")
+
+        return Response(list(occupancy_report(group_by, day_from, day_to)))
+
+
+class AstronomyShowImageVariantView(APIView):
+    """Redirects to a poster variant, rendering it first when it is missing"""
+
+    permission_classes = (IsAuthenticated,)
+    # Rendering is expensive, the limit is per user
+    throttle_classes = (ImageVariantRateThrottle,)
+
+    @extend_schema(responses={302: None})
+    def get(self, request, pk, variant, image_format):
+        if variant not in VARIANTS or image_format not in FORMATS:
+            raise Http404
+        astronomy_show = get_object_or_404(AstronomyShow.objects.only("image"), pk=pk)
+        if not astronomy_show.image:
+            raise Http404
+
+        try:
+            name = generate_variant(astronomy_show.image.name, variant, image_format)
+        except OSError:
+            raise Http404
+        return HttpResponseRedirect(default_storage.url(name))
@@ -24,6 +24,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "planetarium.instrumentation.RequestTimingMiddleware",
+    "planetarium.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -64,9 +66,91 @@ DATABASES = {
     }
 }
 
+# Read replicas with the credentials of the primary (ex. "replica1,replica2:5433")
+for index, address in enumerate(
+    filter(None, os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(","))
+):
+    host, _, port = address.strip().partition(":")
+    DATABASES[f"replica_{index + 1}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or "5432",
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["planetarium.routers.ReplicaRouter"]
+
+# Catalog and schedule reads go to the replicas; writers are pinned to the
+# primary for PIN_SECONDS and unreachable replicas are skipped for RETRY_SECONDS
+READ_REPLICAS = {
+    "ALIASES": [alias for alias in DATABASES if alias != "default"],
+    "PIN_SECONDS": 10,
+    "RETRY_SECONDS": 30,
+    # Shared by all workers, so a pin holds whichever worker serves the read
+    "PIN_CACHE": "catalog",
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Shared by all workers so catalog version bumps invalidate everywhere
+    "catalog": {
+        "BACKEND": os.environ.get(
+            "CATALOG_CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.environ.get(
+            "CATALOG_CACHE_LOCATION", "/tmp/planetarium_catalog_cache"
+        ),
+        "TIMEOUT": 60 * 60 * 24,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+
+# Opt-in Server-Timing headers and timing logs for a share of the requests
+REQUEST_TIMING = {
+    "ENABLED": os.environ.get("REQUEST_TIMING_ENABLED", "") == "1",
+    "SAMPLE_RATE": float(os.environ.get("REQUEST_TIMING_SAMPLE_RATE", "0.01")),
+    "DUPLICATE_THRESHOLD": 3,
+}
+
+# Opt-in cProfile dumps of one request in EVERY, see profile_report
+REQUEST_PROFILING = {
+    "ENABLED": os.environ.get("REQUEST_PROFILING_ENABLED", "") == "1",
+    "EVERY": int(os.environ.get("REQUEST_PROFILING_EVERY", "1000")),
+    "PATHS": (),
+    "HEADER": os.environ.get("REQUEST_PROFILING_HEADER") or None,
+    "DIRECTORY": os.environ.get("REQUEST_PROFILING_DIRECTORY", "profiles"),
+}
+
+# Worker pool rendering the resized astronomy show posters
+IMAGE_VARIANTS = {
+    "WORKERS": int(os.environ.get("IMAGE_VARIANT_WORKERS", "2")),
+    "ASYNC": True,
+}
+
+# Seconds a block found by best_seats stays held for its user
+SEAT_HOLDS = {"HOLD_TTL": 300}
+
+# Tickets of sessions older than HORIZON_DAYS go to TicketArchive
+SESSION_ARCHIVE = {"HORIZON_DAYS": 365, "BATCH_SIZE": 50}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "planetarium.requests": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
-        "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
+        "NAME": (
+            "django.contrib.auth.password_validation."
+            "UserAttributeSimilarityValidator"
+        ),
     },
     {
         "NAME": "django.contrib.auth.password_validation.MinimumLengthValidator",
@@ -100,15 +184,20 @@ AUTH_USER_MODEL = "user.User"
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "planetarium.throttling.SharedAnonRateThrottle",
+        "planetarium.throttling.SharedUserRateThrottle",
     ],
-    "DEFAULT_THROTTLE_RATES": {"anon": "10/day", "user": "30/day"},
-    "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": "10/day",
+        "user": "30/day",
+        "image_variant": "100/hour",
+    },
+    "DEFAULT_AUTHENTICATION_CLASSES": ("user.authentication.CachedJWTAuthentication",),
 }
 
+# Per-process cache of the users behind JWT tokens
+JWT_USER_CACHE = {"TTL": 30, "MAX_SIZE": 1024}
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Planetarium Service API",
     "DESCRIPTION": "Order Planetarium Shows tickets",
@@ -122,6 +211,18 @@ SPECTACULAR_SETTINGS = {
     },
 }
 
+# api/schema/ serves a document prebuilt by build_openapi_schema (or built on
+# the first request); with OPENAPI_SPECTACULAR_RUNTIME=0 the workers do not
+# import drf-spectacular at all
+OPENAPI_SCHEMA = {
+    "SPECTACULAR_RUNTIME": os.environ.get("OPENAPI_SPECTACULAR_RUNTIME", "1") == "1",
+    "DIRECTORY": os.environ.get("OPENAPI_SCHEMA_DIRECTORY", str(BASE_DIR / "openapi")),
+    "MAX_AGE": 300,
+}
+if not OPENAPI_SCHEMA["SPECTACULAR_RUNTIME"]:
+    INSTALLED_APPS.remove("drf_spectacular")
+    del REST_FRAMEWORK["DEFAULT_SCHEMA_CLASS"]
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=50000),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=10000),
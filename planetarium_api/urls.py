@@ -2,25 +2,28 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-    SpectacularRedocView,
-)
+
+from planetarium.openapi import SchemaDocsView, SchemaView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/planetarium/", include("planetarium.urls", namespace="planetarium")),
     path("api/user/", include("user.urls", namespace="user")),
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
+    path("api/schema/", SchemaView.as_view(), name="schema"),
+    path("api/schema/<str:version>/", SchemaView.as_view(), name="schema-version"),
     path(
         "api/doc/swagger/",
-        SpectacularSwaggerView.as_view(url_name="schema"),
+        SchemaDocsView.as_view(
+            template_name="planetarium/swagger_ui.html",
+            dist_setting="SWAGGER_UI_DIST",
+        ),
         name="swagger-ui",
     ),
     path(
         "api/doc/redoc/",
-        SpectacularRedocView.as_view(url_name="schema"),
+        SchemaDocsView.as_view(
+            template_name="planetarium/redoc.html", dist_setting="REDOC_DIST"
+        ),
         name="redoc",
     ),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
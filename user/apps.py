@@ -1,6 +1,12 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
 
 
 class UserConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "user"
+
+    def ready(self):
+        from user import signals  # noqa: F401
+
+        if apps.is_installed("drf_spectacular"):
+            from user import schema  # noqa: F401
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+DEFAULT_SETTINGS = {"TTL": 30, "MAX_SIZE": 1024}
+
+
+def get_settings() -> dict:
+    return {**DEFAULT_SETTINGS, **getattr(settings, "JWT_USER_CACHE", {})}
+
+
+class UserCache:
+    """Thread-safe LRU by user id whose entries expire after a TTL"""
+
+    def __init__(self):
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            cached = self._users.get(user_id)
+            if cached is None:
+                return None
+            expires_at, entry = cached
+            if expires_at <= time.monotonic():
+                del self._users[user_id]
+                return None
+            self._users.move_to_end(user_id)
+            return entry
+
+    def set(self, user_id, entry):
+        options = get_settings()
+        with self._lock:
+            self._users[user_id] = (time.monotonic() + options["TTL"], entry)
+            self._users.move_to_end(user_id)
+            while len(self._users) > options["MAX_SIZE"]:
+                self._users.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that reuses recently loaded users.
+
+    Active users are kept per process for ``JWT_USER_CACHE["TTL"]`` seconds,
+    so repeated requests with a token do not query the user table. Saving or
+    deleting a user drops its entry; other processes see the change after
+    the TTL at the latest.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        cached = user_cache.get(user_id) if user_id is not None else None
+        if cached is None:
+            user = super().get_user(validated_token)
+            user_cache.set(
+                user_id,
+                (
+                    user._state.db,
+                    tuple(
+                        getattr(user, field.attname)
+                        for field in self.user_model._meta.concrete_fields
+                    ),
+                ),
+            )
+            return user
+
+        # Only field values are cached, every request builds its own instance
+        db, values = cached
+        return self.user_model.from_db(
+            db,
+            [field.attname for field in self.user_model._meta.concrete_fields],
+            values,
+        )
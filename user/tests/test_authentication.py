@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from user.authentication import CachedJWTAuthentication, user_cache
+
+ME_URL = reverse("user:manage")
+SHOW_THEME_URL = reverse("planetarium:showtheme-list")
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpassword"
+        )
+        self.token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        table = get_user_model()._meta.db_table
+        return [query for query in queries if table in query["sql"]]
+
+    def test_repeated_reads_do_not_query_user(self):
+        self.assertEqual(len(self.user_queries(SHOW_THEME_URL)), 1)
+        self.assertEqual(self.user_queries(SHOW_THEME_URL), [])
+
+    def test_cached_user_is_a_fresh_instance(self):
+        authentication = CachedJWTAuthentication()
+        first = authentication.get_user(self.token)
+        first.email = "changed@test.com"
+
+        second = authentication.get_user(self.token)
+        third = authentication.get_user(self.token)
+
+        self.assertEqual(second.email, "test@test.com")
+        self.assertIsNot(second._state, third._state)
+        self.assertFalse(second._state.adding)
+        self.assertEqual(second.pk, self.user.pk)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(SHOW_THEME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(SHOW_THEME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_saved_user_is_reloaded(self):
+        self.client.get(SHOW_THEME_URL)
+        res = self.client.post(SHOW_THEME_URL, {"name": "Cosmo"})
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = self.client.post(SHOW_THEME_URL, {"name": "Cosmo"})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_profile_update_through_manage_view(self):
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {"email": "new@test.com"})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data["email"], "new@test.com")